@@ -1,30 +1,252 @@
 from typing import Tuple
 from random import randint
 from math import inf
-from board import Board
+from time import perf_counter
+from board import Board, get_columns, mirror_column
 from eval_tools import terminal_test, get_opponent
+from transposition import (
+    TranspositionTable,
+    canonical_key,
+    EXACT,
+    LOWER_BOUND,
+    UPPER_BOUND,
+)
+from search_stats import SearchStats
 
 
-def alphabeta(board: Board, symbol: str, depth: int, eval_fx, actions_fx) -> int:
-    """Returns the best column to play the next move."""
-    _, best_action = max_value(board, symbol, depth, -inf, +inf, eval_fx, actions_fx)
+def alphabeta(
+    board: Board,
+    symbol: str,
+    depth: int,
+    eval_fx,
+    actions_fx,
+    tt: TranspositionTable = None,
+    threats: bool = False,
+    stats: SearchStats = None,
+) -> int:
+    """
+    Returns the best column to play the next move.
+    The optional transposition table is used to skip the positions already searched.
+    With threats, the immediate wins and the forced blocks are played without
+    searching the other actions (see forced_actions).
+    With stats, the counters of the search are added to it.
+    """
+    if stats is not None:
+        eval_fx, actions_fx = stats.wrap(board, eval_fx, actions_fx)
+    # the root keeps the order of actions_fx, so ties are broken as without table
+    root_actions = list(actions_fx(board)) if tt is not None else None
+    _, best_action = max_value(
+        board,
+        symbol,
+        depth,
+        -inf,
+        +inf,
+        eval_fx,
+        actions_fx,
+        tt,
+        root_actions,
+        threats=threats,
+        stats=stats,
+    )
     return best_action
 
 
+class SearchTimeout(Exception):
+    """Raised inside the search when it must stop before its end."""
+
+
+def iterative_deepening(
+    board: Board,
+    symbol: str,
+    max_depth: int,
+    eval_fx,
+    actions_fx,
+    move_time_ms: int,
+    tt: TranspositionTable = None,
+    threats: bool = False,
+    stats: SearchStats = None,
+) -> int:
+    """
+    Returns the best column found by alpha-beta searches at depth 1, 2, 3...
+    until the time budget is over.
+    The best move of the previous iteration is searched first, and the move of
+    the deepest completed iteration is returned. The depth 1 is always completed.
+    The stats count the nodes of all the iterations.
+    """
+    if stats is not None:
+        eval_fx, actions_fx = stats.wrap(board, eval_fx, actions_fx)
+    deadline = perf_counter() + move_time_ms / 1000
+    stop = lambda: perf_counter() > deadline
+    nb_moves = len(board.history)
+    # no need to search deeper than the end of the game
+    max_depth = min(max_depth, board.NB_ROWS * board.NB_COLUMNS - nb_moves)
+    actions = list(actions_fx(board))
+    best_action = None
+    for depth in range(1, max_depth + 1):
+        root_actions = first_action(actions, best_action)
+        try:
+            _, best_action = max_value(
+                board,
+                symbol,
+                depth,
+                -inf,
+                +inf,
+                eval_fx,
+                actions_fx,
+                tt,
+                root_actions,
+                stop if depth > 1 else None,
+                threats,
+                stats,
+            )
+        except SearchTimeout:
+            # the search was interrupted in the middle of the tree
+            while len(board.history) > nb_moves:
+                board.undo()
+            break
+    return best_action
+
+
+def tt_lookup(
+    tt: TranspositionTable, key: int, depth: int, alpha: float, beta: float, mirrored=False
+):
+    """
+    Returns the stored (score, action) if it can be used as the result of this
+    node, else (None, best_action) where best_action is a move to try first.
+    The scores depend on the remaining depth so only the same depth is reused.
+    With mirrored (see canonical_key), the stored action is mirrored back.
+    """
+    entry = tt.probe(key)
+    if entry is None:
+        return None, None
+    _, entry_depth, score, bound, best_action = entry
+    if mirrored and best_action is not None:
+        best_action = mirror_column(best_action)
+    if entry_depth == depth:
+        if bound == EXACT:
+            return score, best_action
+        if bound == LOWER_BOUND and score > beta:
+            return score, best_action
+        if bound == UPPER_BOUND and score < alpha:
+            return score, best_action
+    return None, best_action
+
+
+def tt_save(
+    tt: TranspositionTable,
+    key: int,
+    depth: int,
+    alpha: float,
+    beta: float,
+    v: float,
+    best_action: int,
+    mirrored=False,
+):
+    """
+    Stores the result of a node searched in the (alpha, beta) window.
+    With mirrored (see canonical_key), the mirror of the action is stored.
+    """
+    if mirrored and best_action is not None:
+        best_action = mirror_column(best_action)
+    if v < alpha:
+        bound = UPPER_BOUND
+    elif v > beta:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    tt.store(key, depth, v, bound, best_action)
+
+
+def cutoff(board: Board, actions_fx, action: int, depth: int):
+    """Tells the actions function (if it learns from them) that action caused a cut off."""
+    on_cutoff = getattr(actions_fx, "on_cutoff", None)
+    if on_cutoff is not None:
+        on_cutoff(board, action, depth)
+
+
+def forced_actions(board: Board, symbol: str, actions):
+    """
+    Returns the actions left by the immediate threats when symbol plays:
+    the first winning action if symbol can win, else the actions which block
+    the winning cells of the opponent, else all the actions.
+    """
+    wins = board.get_winning_moves(symbol)
+    if wins:
+        columns = get_columns(wins)
+        for action in actions:
+            if action in columns:
+                return [action]
+    blocks = board.get_winning_moves(get_opponent(symbol))
+    if blocks:
+        columns = get_columns(blocks)
+        return [action for action in actions if action in columns]
+    return actions
+
+
+def first_action(actions, action):
+    """Returns the actions with this action moved to the first place."""
+    if action is None:
+        return actions
+    actions = list(actions)
+    if action in actions:
+        actions.remove(action)
+        actions.insert(0, action)
+    return actions
+
+
 def max_value(
-    board: Board, symbol: str, depth: int, alpha: int, beta: int, eval_fx, actions_fx
+    board: Board,
+    symbol: str,
+    depth: int,
+    alpha: int,
+    beta: int,
+    eval_fx,
+    actions_fx,
+    tt=None,
+    actions=None,
+    stop=None,
+    threats=False,
+    stats=None,
 ) -> Tuple[float, int]:
+    """
+    If actions is given, these actions are searched in this order (used at the root)
+    and the transposition table is only updated.
+    If stop is given, it is called on each node and SearchTimeout is raised
+    when it returns True.
+    With threats, the actions are restricted by forced_actions, except at depth 1
+    where the children are leaves and the heuristic scores would change.
+    With stats, the nodes and the cut offs are counted (see SearchStats.wrap).
+    """
+    if stop is not None and stop():
+        raise SearchTimeout()
+    if stats is not None:
+        stats.nodes += 1
     # check the terminal test
     if terminal_test(board, depth):
         return eval_fx(board, symbol, depth), 0
+    # check the transposition table
+    tt_action = None
+    if tt is not None:
+        key, mirrored = canonical_key(board, symbol)
+        if actions is None:
+            score, tt_action = tt_lookup(tt, key, depth, alpha, beta, mirrored)
+            if score is not None:
+                return score, tt_action
+        alpha_orig, beta_orig = alpha, beta
+    if actions is None:
+        actions = first_action(actions_fx(board), tt_action)
+    if threats and depth >= 2:
+        actions = forced_actions(board, symbol, actions)
     # init
     v = -inf
     best_action = None
-    for action in actions_fx(board):
+    for action in actions:
         # play the action
         board.put_symbol(symbol, action)
         # compute the utility score of this action
-        v_bis, _ = min_value(board, symbol, depth - 1, alpha, beta, eval_fx, actions_fx)
+        v_bis, _ = min_value(
+            board, symbol, depth - 1, alpha, beta, eval_fx, actions_fx, tt, stop, threats, stats
+        )
         # undo the action
         board.undo()
         # update the best move if the utility is better
@@ -33,14 +255,30 @@ def max_value(
             best_action = action
         # alpha beta cut off
         if v > beta:
+            cutoff(board, actions_fx, best_action, depth)
+            if stats is not None:
+                stats.add_cutoff(best_action == actions[0])
             break
         alpha = max(alpha, v)
+    # save the result
+    if tt is not None:
+        tt_save(tt, key, depth, alpha_orig, beta_orig, v, best_action, mirrored)
     # return the best action
     return v, best_action
 
 
 def min_value(
-    board: Board, symbol: str, depth: int, alpha: int, beta: int, eval_fx, actions_fx
+    board: Board,
+    symbol: str,
+    depth: int,
+    alpha: int,
+    beta: int,
+    eval_fx,
+    actions_fx,
+    tt=None,
+    stop=None,
+    threats=False,
+    stats=None,
 ) -> Tuple[float, int]:
     # "symbol" here is still the maximizing player.
     # If this config is terminal, we need to evaluate it for this player,
@@ -51,17 +289,45 @@ def min_value(
 
     opponent = get_opponent(symbol)
 
+    if stop is not None and stop():
+        raise SearchTimeout()
+    if stats is not None:
+        stats.nodes += 1
     # check the terminal test
     if terminal_test(board, depth):
         return -eval_fx(board, opponent, depth), 0
+    # check the transposition table
+    tt_action = None
+    if tt is not None:
+        key, mirrored = canonical_key(board, symbol)
+        score, tt_action = tt_lookup(tt, key, depth, alpha, beta, mirrored)
+        if score is not None:
+            return score, tt_action
+        alpha_orig, beta_orig = alpha, beta
+    actions = first_action(actions_fx(board), tt_action)
+    if threats and depth >= 2:
+        actions = forced_actions(board, opponent, actions)
     # init
     v = +inf
     best_action = None
-    for action in actions_fx(board):
+    for action in actions:
         # play the action
         board.put_symbol(opponent, action)
         # compute the utility score of this action
-        v_bis, _ = max_value(board, symbol, depth - 1, alpha, beta, eval_fx, actions_fx)
+        v_bis, _ = max_value(
+            board,
+            symbol,
+            depth - 1,
+            alpha,
+            beta,
+            eval_fx,
+            actions_fx,
+            tt,
+            None,
+            stop,
+            threats,
+            stats,
+        )
         # undo the action
         board.undo()
         # update the best move if the utility is better
@@ -70,7 +336,13 @@ def min_value(
             best_action = action
         # alpha beta cut off
         if v < alpha:
+            cutoff(board, actions_fx, best_action, depth)
+            if stats is not None:
+                stats.add_cutoff(best_action == actions[0])
             break
         beta = min(beta, v)
+    # save the result
+    if tt is not None:
+        tt_save(tt, key, depth, alpha_orig, beta_orig, v, best_action, mirrored)
     # return the best action
     return v, best_action
@@ -0,0 +1,142 @@
+# Position analysis: the score of every column of many positions, computed in a
+# pool of processes, to study recorded games.
+#
+# python3 analysis.py games.rec --depth 5 --output scores.npy
+#
+# The scores are a float64 array (n, NB_COLUMNS), for the player to move, with
+# NaN for the full columns.
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from math import inf
+import numpy as np
+from board import Board
+from alpha_beta import min_value
+from transposition import TranspositionTable
+from game_record import read_records
+from eval_tools import get_opponent
+import eval_tools
+
+# The number of positions sent to a worker at once
+CHUNK_SIZE = 64
+# The transposition table of a worker
+TT_SIZE = 1 << 18
+
+# The table of a worker process, set by init_worker
+worker_tt = None
+
+
+def init_worker(tt_size) -> None:
+    """Creates the table of the worker, kept between its chunks."""
+    global worker_tt
+    worker_tt = TranspositionTable(tt_size) if tt_size else None
+
+
+def is_finished(board: Board) -> bool:
+    """Returns True if the last move has won or if the board is full."""
+    symbol = get_opponent(board.get_symbol_to_play())
+    return board.is_winner(symbol) or board.is_full()
+
+
+# Search ------------------------------------------------------------------------
+
+
+def multi_pv(board: Board, symbol: str, depth: int, eval_fx, actions_fx, tt=None) -> np.ndarray:
+    """
+    Returns the exact score of each column for symbol, NaN for the full columns.
+    Unlike max_value, no column is cut off by the score of the previous ones:
+    each one is searched with the full window. The table is shared by the
+    columns, so the positions they have in common are searched once.
+    """
+    scores = np.full(board.NB_COLUMNS, np.nan)
+    for action in actions_fx(board):
+        board.put_symbol(symbol, action)
+        scores[action], _ = min_value(
+            board, symbol, depth - 1, -inf, +inf, eval_fx, actions_fx, tt
+        )
+        board.undo()
+    return scores
+
+
+def analyze_chunk(positions, depth: int, eval_fx, actions_fx) -> np.ndarray:
+    """Returns the multi_pv scores of positions (move lists), in a worker."""
+    scores = np.empty((len(positions), Board.NB_COLUMNS))
+    for i, moves in enumerate(positions):
+        board = Board.from_moves(moves)
+        symbol = board.get_symbol_to_play()
+        scores[i] = multi_pv(board, symbol, depth, eval_fx, actions_fx, worker_tt)
+    return scores
+
+
+def analyze(
+    boards,
+    depth: int,
+    eval_fx,
+    actions_fx,
+    workers=None,
+    chunk_size: int = CHUNK_SIZE,
+    tt_size: int = TT_SIZE,
+) -> np.ndarray:
+    """
+    Returns the scores (n, NB_COLUMNS) of the columns of the boards, for the
+    player to move (see multi_pv). The boards are sent by chunks of chunk_size
+    to a pool of processes, each with a transposition table of tt_size entries.
+    The finished games (won or full) only have NaN scores.
+    """
+    positions = [tuple(board.history) for board in boards]
+    scores = np.full((len(positions), Board.NB_COLUMNS), np.nan)
+    # the finished games have no move to score
+    indexes = [i for i, board in enumerate(boards) if not is_finished(board)]
+    chunks = [indexes[i : i + chunk_size] for i in range(0, len(indexes), chunk_size)]
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(tt_size,)) as pool:
+        futures = [
+            pool.submit(
+                analyze_chunk, [positions[i] for i in chunk], depth, eval_fx, actions_fx
+            )
+            for chunk in chunks
+        ]
+        for chunk, future in zip(chunks, futures):
+            scores[chunk] = future.result()
+    return scores
+
+
+def record_boards(path: str):
+    """Returns the boards of all the positions of the games of a record file."""
+    boards = []
+    for record in read_records(path):
+        for i in range(len(record.moves)):
+            boards.append(Board.from_moves(record.moves[:i]))
+    return boards
+
+
+# Script ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 Analysis",
+        description="Score every column of the positions of recorded games.",
+    )
+    parser.add_argument("records", type=str, help="The game record file (see game_record.py).")
+    parser.add_argument("--depth", type=int, default=5, help="The search depth.")
+    parser.add_argument("--eval", type=str, default="eval_3", help="The eval function.")
+    parser.add_argument(
+        "--actions", type=str, default="board_actions_2", help="The actions function."
+    )
+    parser.add_argument("--workers", type=int, default=None, help="The number of processes.")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE, help="The positions sent at once."
+    )
+    parser.add_argument("--output", type=str, default="analysis.npy", help="The .npy file.")
+    args = parser.parse_args()
+
+    boards = record_boards(args.records)
+    scores = analyze(
+        boards,
+        args.depth,
+        getattr(eval_tools, args.eval),
+        getattr(eval_tools, args.actions),
+        args.workers,
+        args.chunk_size,
+    )
+    np.save(args.output, scores)
+    print(f"{len(scores)} positions written in {args.output}")
@@ -1,5 +1,129 @@
-from copy import deepcopy
-from typing import Optional
+from typing import Optional, Tuple
+
+
+# Bitboard layout ----------------------------------------------------
+#
+# Each column uses NB_ROWS + 1 bits: NB_ROWS cells plus a sentinel bit on top
+# that is always empty, so shifted masks never wrap from a column to the next.
+# The cell at `height` (counted from the bottom) of `column` is the bit
+# `column * COLUMN_BITS + height`.
+#
+#  6 13 20 27 34 41 48
+#  5 12 19 26 33 40 47
+#  4 11 18 25 32 39 46
+#  3 10 17 24 31 38 45
+#  2  9 16 23 30 37 44
+#  1  8 15 22 29 36 43
+#  0  7 14 21 28 35 42
+
+NB_COLUMNS = 7
+NB_ROWS = 6
+COLUMN_BITS = NB_ROWS + 1
+
+# Shifts to the next cell: vertical, horizontal, diagonal (\) and diagonal (/)
+ALIGNMENT_SHIFTS = (1, COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1)
+
+# The bottom cell of each column
+BOTTOM_MASK = sum(1 << (column * COLUMN_BITS) for column in range(NB_COLUMNS))
+
+# All the cells of the board
+BOARD_MASK = BOTTOM_MASK * ((1 << NB_ROWS) - 1)
+# The cells of each column
+COLUMN_MASKS = tuple(((1 << NB_ROWS) - 1) << (c * COLUMN_BITS) for c in range(NB_COLUMNS))
+
+# The bit of each cell, indexed by [row][column] with the row 0 on the top
+CELL_BITS = tuple(
+    tuple(1 << (column * COLUMN_BITS + NB_ROWS - 1 - row) for column in range(NB_COLUMNS))
+    for row in range(NB_ROWS)
+)
+
+# The bit of the mirror cell (left-right reflection) of each bit
+MIRROR_CELLS = tuple(
+    1 << ((NB_COLUMNS - 1 - bit // COLUMN_BITS) * COLUMN_BITS + bit % COLUMN_BITS)
+    for bit in range(NB_COLUMNS * COLUMN_BITS)
+)
+
+# Windows of 4 cells ------------------------------------------------
+
+
+def get_window_bits():
+    """Returns the bit indexes of the 69 windows of 4 aligned cells."""
+    windows = []
+    for column in range(NB_COLUMNS):
+        for height in range(NB_ROWS):
+            for d_column, d_height in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                cells = [
+                    (column + i * d_column, height + i * d_height) for i in range(4)
+                ]
+                if all(0 <= c < NB_COLUMNS and 0 <= h < NB_ROWS for c, h in cells):
+                    windows.append(tuple(c * COLUMN_BITS + h for c, h in cells))
+    return windows
+
+
+WINDOW_BITS = get_window_bits()
+# The windows containing each bit
+CELL_WINDOWS = tuple(
+    tuple(w for w, bits in enumerate(WINDOW_BITS) if bit in bits)
+    for bit in range(NB_COLUMNS * COLUMN_BITS)
+)
+# The score of a window with n tokens of a single player
+WINDOW_WEIGHTS = (0, 0, 100, 1000, 10000)
+# The score for red of a window, indexed by [red count][yellow count]
+WINDOW_SCORES = tuple(
+    tuple(
+        WINDOW_WEIGHTS[red] if yellow == 0 else -WINDOW_WEIGHTS[yellow] if red == 0 else 0
+        for yellow in range(5)
+    )
+    for red in range(5)
+)
+
+
+def has_four(mask: int) -> bool:
+    """Returns True if the bitboard contains four aligned tokens."""
+    for shift in ALIGNMENT_SHIFTS:
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+def winning_cells(position: int, mask: int) -> int:
+    """Returns the empty cells which complete an alignment of 4 for position."""
+    # vertical
+    r = (position << 1) & (position << 2) & (position << 3)
+    # horizontal and diagonals
+    for shift in (COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1):
+        p = (position << shift) & (position << 2 * shift)
+        r |= p & (position << 3 * shift)
+        r |= p & (position >> shift)
+        p = (position >> shift) & (position >> 2 * shift)
+        r |= p & (position << shift)
+        r |= p & (position >> 3 * shift)
+    return r & (BOARD_MASK ^ mask)
+
+
+def possible_moves(mask: int) -> int:
+    """Returns the cells where a token can be played."""
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+def position_key(position: int, mask: int) -> int:
+    """
+    Returns an integer which identifies the position (the red tokens) in mask.
+    Adding the bottom row to the full mask leaves one bit on top of each
+    column, so the red tokens below it are enough to tell the players apart.
+    """
+    return position + mask + BOTTOM_MASK
+
+
+def get_columns(cells: int) -> list:
+    """Returns the columns of the cells, from left to right."""
+    return [c for c in range(NB_COLUMNS) if cells & COLUMN_MASKS[c]]
+
+
+def mirror_column(column: int) -> int:
+    """Returns the column on the other side of the board (left-right reflection)."""
+    return NB_COLUMNS - 1 - column
 
 
 class Board:
@@ -7,94 +131,91 @@ class Board:
     YELLOW = "Y"
     EMPTY = " "
 
-    NB_COLUMNS = 7
-    NB_ROWS = 6
+    NB_COLUMNS = NB_COLUMNS
+    NB_ROWS = NB_ROWS
 
-    def __init__(self) -> None:
-        # The board
-        self.board = [
-            [self.EMPTY for _ in range(self.NB_COLUMNS)] for _ in range(self.NB_ROWS)
-        ]
+    # No __dict__: the boards are small and fast to copy
+    __slots__ = (
+        "__red",
+        "__yellow",
+        "__mirror_red",
+        "__mirror_yellow",
+        "history",
+        "__heights",
+        "__winner",
+        "__red_counts",
+        "__yellow_counts",
+        "__window_score",
+    )
+
+    def __init__(self, track_windows: bool = False) -> None:
+        """
+        With track_windows, the number of tokens of each player in each window
+        is kept up to date (see get_window_score).
+        """
+        # The bitboard of each player
+        self.__red = 0
+        self.__yellow = 0
+        # The bitboards of the mirror position, for get_canonical_key
+        self.__mirror_red = 0
+        self.__mirror_yellow = 0
         # The move history
         self.history = []
-        # The list of the free position in each column
-        self.column_top_positions = [self.NB_ROWS - 1 for _ in range(self.NB_COLUMNS)]
+        # The number of tokens in each column
+        self.__heights = bytearray(self.NB_COLUMNS)
         # Store the winner
         self.__winner = None
+        # The window counts, None when they are not tracked
+        self.__red_counts = None
+        self.__yellow_counts = None
+        self.__window_score = 0
+        if track_windows:
+            self.track_windows()
 
     def __str__(self) -> str:
         """
         Returns a string representation of the board.
         """
         result = ""
-        for row in self.board:
-            result += "| " + " | ".join(row) + " |\n"
+        for row in range(self.NB_ROWS):
+            cells = (self.get_cell_value(row, col) for col in range(self.NB_COLUMNS))
+            result += "| " + " | ".join(cells) + " |\n"
         result += "|---" * self.NB_COLUMNS + "|\n"
         result += "| " + " | ".join(str(i) for i in range(self.NB_COLUMNS))
         return result
 
+    @classmethod
+    def from_moves(cls, moves):
+        """Returns the board after these moves (columns), played in turn from red."""
+        board = cls()
+        for column in moves:
+            board.put_symbol(board.get_symbol_to_play(), column)
+        return board
+
+    def get_symbol_to_play(self) -> str:
+        """Returns the symbol of the next move, red always starts."""
+        return self.RED if len(self.history) % 2 == 0 else self.YELLOW
+
     def copy(self):
         """
         Creates and returns a deep copy of the board.
         """
-        return deepcopy(self)
-
-    def __compute_winner(self):
-        last_column = self.history[-1]
-        last_row = self.column_top_positions[last_column] + 1
-        symbol = self.board[last_row][last_column]
-
-        # Check horizontal
-        for i in range(4):
-            bmin = last_column - i
-            bmax = bmin + 3
-            if bmin < 0 or bmax >= self.NB_COLUMNS:
-                continue
-            if all(self.board[last_row][c] == symbol for c in range(bmin, bmax + 1)):
-                self.__winner = symbol
-                return
-
-        # Check vertically
-        for i in range(4):
-            bmin = last_row - i
-            bmax = bmin + 3
-            if bmin < 0 or bmax >= self.NB_ROWS:
-                continue
-            if all(self.board[r][last_column] == symbol for r in range(bmin, bmax + 1)):
-                self.__winner = symbol
-                return
-
-        # Check diagonal
-        for i in range(4):
-            brmin = last_row - i
-            brmax = brmin + 3
-            bcmin = last_column - i
-            bcmax = bcmin + 3
-
-            if brmin < 0 or brmax >= self.NB_ROWS:
-                continue
-            if bcmin < 0 or bcmax >= self.NB_COLUMNS:
-                continue
-
-            if all(self.board[brmin + j][bcmin + j] == symbol for j in range(4)):
-                self.__winner = symbol
-                return
-
-        # Check diagonal (neg)
-        for i in range(4):
-            brmin = last_row - i
-            brmax = brmin + 3
-            bcmax = last_column + i
-            bcmin = bcmax - 3
-
-            if brmin < 0 or brmax >= self.NB_ROWS:
-                continue
-            if bcmin < 0 or bcmax >= self.NB_COLUMNS:
-                continue
-
-            if all(self.board[brmin + j][bcmax - j] == symbol for j in range(4)):
-                self.__winner = symbol
-                return
+        board = Board.__new__(Board)
+        board.__red = self.__red
+        board.__yellow = self.__yellow
+        board.__mirror_red = self.__mirror_red
+        board.__mirror_yellow = self.__mirror_yellow
+        board.history = self.history.copy()
+        board.__heights = self.__heights[:]
+        board.__winner = self.__winner
+        if self.__red_counts is None:
+            board.__red_counts = None
+            board.__yellow_counts = None
+        else:
+            board.__red_counts = self.__red_counts[:]
+            board.__yellow_counts = self.__yellow_counts[:]
+        board.__window_score = self.__window_score
+        return board
 
     def put_symbol(self, symbol: str, column: int):
         """
@@ -102,15 +223,63 @@ class Board:
         Returns True if it's possible, False if the column is full.
         """
         assert not self.is_column_full(column), "The column is full!"
-        # Get the free position on this column
-        top_pos = self.column_top_positions[column]
-        # Put the symbol and update history and free space for the column
-        self.board[top_pos][column] = symbol
+        # Put the symbol on the free position of this column
+        bit = column * COLUMN_BITS + self.__heights[column]
+        cell = 1 << bit
+        if symbol == self.RED:
+            mask = self.__red = self.__red | cell
+            self.__mirror_red |= MIRROR_CELLS[bit]
+        else:
+            mask = self.__yellow = self.__yellow | cell
+            self.__mirror_yellow |= MIRROR_CELLS[bit]
+        if self.__red_counts is not None:
+            self.__update_windows(bit, symbol == self.RED, 1)
+        # Update history and free space for the column
         self.history.append(column)
-        self.column_top_positions[column] -= 1
-        # Compute the actual winner
-        self.__compute_winner()
-    
+        self.__heights[column] += 1
+        # Compute the actual winner, only the last player can have won
+        if has_four(mask):
+            self.__winner = symbol
+
+    def __update_windows(self, bit: int, is_red: bool, delta: int):
+        """Adds delta tokens on the windows of this bit and updates the score."""
+        counts = self.__red_counts if is_red else self.__yellow_counts
+        red_counts = self.__red_counts
+        yellow_counts = self.__yellow_counts
+        score = self.__window_score
+        for w in CELL_WINDOWS[bit]:
+            score -= WINDOW_SCORES[red_counts[w]][yellow_counts[w]]
+            counts[w] += delta
+            score += WINDOW_SCORES[red_counts[w]][yellow_counts[w]]
+        self.__window_score = score
+
+    def track_windows(self):
+        """
+        Starts to keep the window counts up to date in put_symbol and undo.
+        Does nothing if they are already tracked.
+        """
+        if self.__red_counts is not None:
+            return
+        self.__red_counts = [
+            sum(self.__red >> bit & 1 for bit in bits) for bits in WINDOW_BITS
+        ]
+        self.__yellow_counts = [
+            sum(self.__yellow >> bit & 1 for bit in bits) for bits in WINDOW_BITS
+        ]
+        self.__window_score = sum(
+            WINDOW_SCORES[r][y] for r, y in zip(self.__red_counts, self.__yellow_counts)
+        )
+
+    def get_window_score(self, symbol: str) -> int:
+        """
+        Returns the sum of the window scores (WINDOW_SCORES) for this symbol.
+        The window tracking starts on the first call.
+        """
+        self.track_windows()
+        if symbol == self.RED:
+            return self.__window_score
+        return -self.__window_score
+
     def get_last_move(self) -> Optional[int]:
         """Returns the last played move."""
         if len(self.history) > 0:
@@ -125,23 +294,58 @@ class Board:
         assert len(self.history) > 0, "Empty history!"
         # Get the last played column
         last_column = self.history.pop()
-        # Decrements the last free space in the last played column
-        self.column_top_positions[last_column] += 1
-        # Put the empty symbol
-        top_pos = self.column_top_positions[last_column]
-        self.board[top_pos][last_column] = Board.EMPTY
+        # Decrements the height of the last played column
+        self.__heights[last_column] -= 1
+        # Remove the token from the mask that owns it
+        bit = last_column * COLUMN_BITS + self.__heights[last_column]
+        cell = 1 << bit
+        is_red = self.__red & cell
+        if is_red:
+            self.__red ^= cell
+            self.__mirror_red ^= MIRROR_CELLS[bit]
+        else:
+            self.__yellow ^= cell
+            self.__mirror_yellow ^= MIRROR_CELLS[bit]
+        if self.__red_counts is not None:
+            self.__update_windows(bit, is_red, -1)
         # Reset winner
         self.__winner = None
 
+    def get_mask(self, symbol: str) -> int:
+        """Returns the bitboard of the tokens of this symbol."""
+        return self.__red if symbol == self.RED else self.__yellow
+
+    def get_winning_moves(self, symbol: str) -> int:
+        """Returns the playable cells (as a bitboard) where the symbol wins."""
+        mask = self.__red | self.__yellow
+        return winning_cells(self.get_mask(symbol), mask) & possible_moves(mask)
+
+    def get_canonical_key(self) -> Tuple[int, bool]:
+        """
+        Returns (key, mirrored): the smallest position_key of the position and of
+        its mirror, so both have the same key, and True if it is the key of the
+        mirror. The moves of a mirrored key are stored as their mirror_column.
+        """
+        key = position_key(self.__red, self.__red | self.__yellow)
+        mirror_key = position_key(self.__mirror_red, self.__mirror_red | self.__mirror_yellow)
+        if mirror_key < key:
+            return mirror_key, True
+        return key, False
+
     def get_cell_value(self, row: int, column: int) -> str:
         """
         Returns the value of the cell at the given row and column.
         """
-        return self.board[row][column]
-    
+        cell = CELL_BITS[row][column]
+        if self.__red & cell:
+            return self.RED
+        if self.__yellow & cell:
+            return self.YELLOW
+        return self.EMPTY
+
     def get_top_position(self, column: int) -> int:
         """Returns the top position (where put the next move) of the column."""
-        return self.column_top_positions[column]
+        return self.NB_ROWS - 1 - self.__heights[column]
 
     def is_valid_position(self, row: int, column: int) -> bool:
         """
@@ -155,7 +359,7 @@ class Board:
         Returns True if the column is full, False otherwise.
         """
         assert 0 <= column < self.NB_COLUMNS
-        return self.column_top_positions[column] < 0
+        return self.__heights[column] == self.NB_ROWS
 
     def is_winner(self, symbol: str) -> bool:
         return self.__winner == symbol
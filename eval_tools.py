@@ -1,4 +1,5 @@
-from board import Board
+import numpy as np
+from board import Board, COLUMN_BITS
 from random import shuffle, randint
 
 # ---------------
@@ -76,6 +77,59 @@ def board_actions_5(board: Board):
                     yield column
 
 
+class HistoryActions:
+    """
+    Returns the columns ordered by what caused cut offs in the previous searches:
+    first the killer moves of this ply, then by history score of the cell
+    (row, column), and from center to out on ties.
+    The search calls on_cutoff when an action causes a cut off.
+    """
+
+    NB_KILLERS = 2
+    MAX_HISTORY = 1 << 20
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self):
+        """Forgets the killer moves and the history."""
+        # the killer moves of each ply (number of moves played)
+        self.killers = [[] for _ in range(Board.NB_ROWS * Board.NB_COLUMNS + 1)]
+        # the history score of each cell, indexed by [row][column]
+        self.history = [[0] * Board.NB_COLUMNS for _ in range(Board.NB_ROWS)]
+
+    def __call__(self, board: Board):
+        killers = self.killers[len(board.history)]
+
+        def key(column):
+            killer_rank = killers.index(column) if column in killers else self.NB_KILLERS
+            row = board.get_top_position(column)
+            return killer_rank, -self.history[row][column]
+
+        # sorted is stable: the center columns stay first on ties
+        return sorted(board_actions_2(board), key=key)
+
+    def on_cutoff(self, board: Board, action: int, depth: int):
+        """Called by the search when action causes a cut off on this board."""
+        killers = self.killers[len(board.history)]
+        if action in killers:
+            killers.remove(action)
+        killers.insert(0, action)
+        del killers[self.NB_KILLERS :]
+        row = board.get_top_position(action)
+        self.history[row][action] += depth * depth
+        # age the history, the recent cut offs are more relevant
+        if self.history[row][action] > self.MAX_HISTORY:
+            for scores in self.history:
+                for column in range(len(scores)):
+                    scores[column] //= 2
+
+
+# The default ordering of the standalone searches (alphabeta...), each player
+# learns with its own HistoryActions (see EvalPlayer)
+board_actions_history = HistoryActions()
+
+
 # End Board Actions -------------------
 
 
@@ -100,13 +154,7 @@ def count_win_move(board: Board, symbol: str) -> int:
     """
     Returns the number of winning moves on the board for the symbol.
     """
-    res = 0
-    for column in board_actions_1(board):
-        board.put_symbol(symbol, column)
-        if board.is_winner(symbol):
-            res += 1
-        board.undo()
-    return res
+    return board.get_winning_moves(symbol).bit_count()
 
 
 # ---------------
@@ -318,3 +366,143 @@ def eval_4(board: Board, symbol: str, depth: int) -> float | int:
         return score / nb_config
     else:
         return 0
+
+
+# ---------------
+# Eval 5
+# ---------------
+
+
+def eval_5(board: Board, symbol: str, depth: int) -> int:
+    """
+    Sum of the scores of the windows with the tokens of a single player.
+    The board keeps this sum up to date in put_symbol and undo, so it costs O(1).
+    """
+    return board.get_window_score(symbol)
+
+
+# ---------------
+# Vectorized evals (NumPy)
+# ---------------
+
+# Cell codes of the board array
+NP_EMPTY = 0
+NP_RED = 1
+NP_YELLOW = 2
+
+
+def get_windows():
+    """
+    Returns the 69 windows of 4 cells, as lists of (row, col), in the order
+    used by eval_4.
+    """
+    windows = []
+    for row in range(Board.NB_ROWS):
+        for col in range(Board.NB_COLUMNS):
+            for d_row, d_col in ((0, 1), (1, 1), (1, 0), (1, -1)):
+                cells = [(row + i * d_row, col + i * d_col) for i in range(4)]
+                if all(
+                    0 <= r < Board.NB_ROWS and 0 <= c < Board.NB_COLUMNS
+                    for r, c in cells
+                ):
+                    windows.append(cells)
+    return windows
+
+
+def get_ray_scores():
+    """
+    Returns the score of evaluate_direction for each ray of 3 cells,
+    indexed by 9 * code_1 + 3 * code_2 + code_3 where the codes are
+    0 (empty), 1 (player) or 2 (opponent).
+    """
+    scores = []
+    for index in range(27):
+        codes = (index // 9, index // 3 % 3, index % 3)
+        # build the ray on the bottom row, from the player token in column 0
+        board = Board()
+        board.put_symbol(Board.RED, 0)
+        for column, code in enumerate(codes, 1):
+            if code == 1:
+                board.put_symbol(Board.RED, column)
+            elif code == 2:
+                board.put_symbol(Board.YELLOW, column)
+        bottom = Board.NB_ROWS - 1
+        scores.append(
+            evaluate_direction(board, bottom, 0, Board.RED, Board.YELLOW, 0, 1)
+        )
+    return np.array(scores)
+
+
+WINDOWS = get_windows()
+# The cell index (row * NB_COLUMNS + col) of each window
+WINDOW_CELLS = np.array([[r * Board.NB_COLUMNS + c for r, c in w] for w in WINDOWS])
+WINDOW_ROWS = np.array([[r for r, _ in w] for w in WINDOWS])
+WINDOW_COLUMNS = np.array([[c for _, c in w] for w in WINDOWS])
+# Each window is a ray of 3 cells from its first cell and from its last cell
+RAY_ANCHORS = np.concatenate((WINDOW_CELLS[:, 0], WINDOW_CELLS[:, 3]))
+RAY_CELLS = np.concatenate((WINDOW_CELLS[:, 1:], WINDOW_CELLS[:, 2::-1]))
+RAY_SCORES = get_ray_scores()
+RAY_WEIGHTS = np.array((9, 3, 1))
+# The bit of each cell in the bitboards
+CELL_BITS = np.array(
+    [
+        col * COLUMN_BITS + Board.NB_ROWS - 1 - row
+        for row in range(Board.NB_ROWS)
+        for col in range(Board.NB_COLUMNS)
+    ]
+)
+
+
+def board_array(board: Board) -> np.ndarray:
+    """
+    Returns the cells of the board as a flat array indexed by row * NB_COLUMNS + col,
+    with the codes NP_EMPTY, NP_RED and NP_YELLOW.
+    """
+    bits = []
+    for symbol in (Board.RED, Board.YELLOW):
+        mask = np.frombuffer(board.get_mask(symbol).to_bytes(8, "little"), np.uint8)
+        bits.append(np.unpackbits(mask, bitorder="little")[CELL_BITS].astype(np.intp))
+    return bits[0] * NP_RED + bits[1] * NP_YELLOW
+
+
+def eval_3_np(board: Board, symbol: str, depth: int) -> int:
+    """Same score as eval_3, computed on all the rays at once."""
+    me = NP_RED if symbol == Board.RED else NP_YELLOW
+    opponent = NP_YELLOW if me == NP_RED else NP_RED
+    cells = board_array(board)
+    anchors = cells[RAY_ANCHORS]
+    rays = cells[RAY_CELLS]
+    # codes from the point of view of the anchor: swap red and yellow for yellow
+    rays = np.where(anchors[:, None] == NP_RED, rays, (3 - rays) % 3)
+    scores = RAY_SCORES[rays @ RAY_WEIGHTS]
+    return int(scores[anchors == me].sum() - scores[anchors == opponent].sum())
+
+
+def eval_4_np(board: Board, symbol: str, depth: int) -> float | int:
+    """Same score as eval_4, computed on all the windows at once."""
+    me = NP_RED if symbol == Board.RED else NP_YELLOW
+    cells = board_array(board)[WINDOW_CELLS]
+    empty = cells == NP_EMPTY
+    my_count = (cells == me).sum(axis=1)
+    opponent_count = 4 - my_count - empty.sum(axis=1)
+    empty_count = empty.sum(axis=1)
+    # distance between the empty cells and the top of their column
+    tops = np.array([board.get_top_position(c) for c in range(board.NB_COLUMNS)])
+    distance = np.where(empty, tops[WINDOW_COLUMNS] - WINDOW_ROWS, 0).sum(axis=1)
+    distance = np.maximum(distance, 1)
+    # weight of each window
+    def weights(count):
+        return np.select(
+            (count == 4, (count == 3) & (empty_count == 1), (count == 2) & (empty_count == 2)),
+            (10000, 1000, 100),
+            0,
+        )
+
+    my_weights = weights(my_count)
+    opponent_weights = weights(opponent_count)
+    nb_config = np.count_nonzero(my_weights) + np.count_nonzero(opponent_weights)
+    if nb_config == 0:
+        return 0
+    scores = my_weights / distance - opponent_weights / distance
+    # summed in the same order as eval_4 to get exactly the same float
+    return sum(scores.tolist()) / int(nb_config)
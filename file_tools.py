@@ -0,0 +1,7 @@
+def append_to_file(path: str, data: bytes) -> None:
+    """
+    Appends data at the end of the file in one write: the processes of a pool
+    can append to the same file without mixing their data.
+    """
+    with open(path, mode="ab") as f:
+        f.write(data)
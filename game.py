@@ -1,11 +1,17 @@
 from player import Player
 from board import Board
+from game_record import GameRecord, append_record
 from colorama import just_fix_windows_console, Fore
 
 
 class Game:
-    def __init__(self, player_r: Player, player_y: Player) -> None:
+    def __init__(self, player_r: Player, player_y: Player, record_path=None) -> None:
+        """
+        With record_path, the game is appended to this game record file
+        (see game_record.py) when it ends.
+        """
         self.board = Board()
+        self.record_path = record_path
         self.player_r = player_r
         self.player_y = player_y
         self.next_player = player_r
@@ -48,6 +54,25 @@ class Game:
         else:
             self.next_player = self.player_y
 
+        if self.has_ended():
+            self.player_r.end_game()
+            self.player_y.end_game()
+            if self.record_path is not None:
+                append_record(self.record_path, self.get_record())
+
+    def get_record(self) -> GameRecord:
+        """
+        Returns the record of the game: the players, the winner and the moves.
+        """
+        winner = None
+        if self.is_winner(Board.RED):
+            winner = Board.RED
+        elif self.is_winner(Board.YELLOW):
+            winner = Board.YELLOW
+        return GameRecord(
+            str(self.player_r), str(self.player_y), winner, tuple(self.board.history)
+        )
+
     def is_winner(self, symbol: str) -> bool:
         """
         Return True if this symbol is the winner, otherwise False.
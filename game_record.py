@@ -0,0 +1,112 @@
+# Game records: the moves and the result of finished games in a binary file.
+#
+# A file is a stream of records, each one prefixed by its size:
+# - size of the rest of the record (2 bytes),
+# - number of moves (1 byte), winner (1 byte: 0 draw, 1 red, 2 yellow),
+# - name of the red player, name of the yellow player (1 byte of size + UTF-8),
+# - the columns of the moves, 3 bits each (the first move in the lowest bits).
+
+import struct
+from typing import Iterator, NamedTuple, Optional, Tuple
+from board import Board
+from file_tools import append_to_file
+
+SIZE = struct.Struct("<H")
+HEADER = struct.Struct("<BB")
+MOVE_BITS = 3
+
+WINNER_CODES = {None: 0, Board.RED: 1, Board.YELLOW: 2}
+WINNERS = {code: winner for winner, code in WINNER_CODES.items()}
+
+
+class GameRecord(NamedTuple):
+    red: str
+    yellow: str
+    winner: Optional[str]
+    moves: Tuple[int, ...]
+
+
+# Encoding ----------------------------------------------------------------------
+
+
+def pack_moves(moves) -> bytes:
+    """Returns the columns packed on MOVE_BITS bits each."""
+    value = 0
+    for i, column in enumerate(moves):
+        value |= column << (i * MOVE_BITS)
+    return value.to_bytes((len(moves) * MOVE_BITS + 7) // 8, "little")
+
+
+def unpack_moves(data: bytes, nb_moves: int) -> Tuple[int, ...]:
+    """Returns the nb_moves columns packed in data."""
+    value = int.from_bytes(data, "little")
+    mask = (1 << MOVE_BITS) - 1
+    return tuple(value >> (i * MOVE_BITS) & mask for i in range(nb_moves))
+
+
+def pack_name(name: str) -> bytes:
+    data = name.encode("utf-8")
+    assert len(data) < 256, "The player name is too long!"
+    return bytes((len(data),)) + data
+
+
+def encode_record(record: GameRecord) -> bytes:
+    """Returns the record with its size prefix."""
+    data = (
+        HEADER.pack(len(record.moves), WINNER_CODES[record.winner])
+        + pack_name(record.red)
+        + pack_name(record.yellow)
+        + pack_moves(record.moves)
+    )
+    return SIZE.pack(len(data)) + data
+
+
+def decode_record(data: bytes) -> GameRecord:
+    """Returns the record of data (without the size prefix)."""
+    nb_moves, winner = HEADER.unpack_from(data)
+    offset = HEADER.size
+    names = []
+    for _ in range(2):
+        size = data[offset]
+        names.append(data[offset + 1 : offset + 1 + size].decode("utf-8"))
+        offset += 1 + size
+    return GameRecord(names[0], names[1], WINNERS[winner], unpack_moves(data[offset:], nb_moves))
+
+
+# Files -------------------------------------------------------------------------
+
+
+def append_record(path: str, record: GameRecord) -> None:
+    """Appends a record at the end of the file (see append_to_file)."""
+    append_to_file(path, encode_record(record))
+
+
+class RecordWriter:
+    """Writes many records in a file kept open, call close() at the end."""
+
+    def __init__(self, path: str, append: bool = True) -> None:
+        self.__file = open(path, mode="ab" if append else "wb")
+
+    def write(self, record: GameRecord) -> None:
+        self.__file.write(encode_record(record))
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+def read_records(path: str) -> Iterator[GameRecord]:
+    """Yields the records of the file one by one, the file is not loaded in memory."""
+    with open(path, mode="rb") as f:
+        while True:
+            prefix = f.read(SIZE.size)
+            if not prefix:
+                return
+            (size,) = SIZE.unpack(prefix)
+            data = f.read(size)
+            assert len(data) == size, "The last record is truncated!"
+            yield decode_record(data)
+
+
+def replay(record: GameRecord) -> Board:
+    """Returns the board at the end of the recorded game."""
+    return Board.from_moves(record.moves)
@@ -0,0 +1,101 @@
+# Game store: the results of the finished games in a JSON lines file, one game
+# per line, so an interrupted tournament resumes where it stopped and the games
+# already played are not played again.
+#
+# A game is identified by (red spec, yellow spec, seed, game index, code version):
+# the games are seeded (see seed_game) so the same key always gives the same
+# game, and the code version changes when the code of the AI changes.
+# The players with a time budget (:t) or workers (:w) are not reproducible.
+
+import hashlib
+import json
+import os
+import random
+from typing import Optional
+from file_tools import append_to_file
+
+# The files which change the games when they change
+CODE_FILES = (
+    "alpha_beta.py",
+    "board.py",
+    "eval_tools.py",
+    "game.py",
+    "minimax.py",
+    "opening_book.py",
+    "parallel_search.py",
+    "player.py",
+    "pvs.py",
+    "solver.py",
+    "transposition.py",
+)
+
+
+def get_code_version() -> str:
+    """Returns a hash of the CODE_FILES."""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in CODE_FILES:
+        with open(os.path.join(directory, name), mode="rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def get_game_seed(seed: int, red: str, yellow: str, index: int) -> str:
+    """Returns the seed of the index-th game of a matchup."""
+    return f"{seed}:{red}:{yellow}:{index}"
+
+
+def seed_game(game_seed: str, *players) -> None:
+    """Seeds the random module and clears the players before a game."""
+    random.seed(game_seed)
+    for player in players:
+        player.new_game()
+
+
+def append_game(path: str, game: dict) -> None:
+    """Appends a game at the end of the store (see append_to_file)."""
+    append_to_file(path, (json.dumps(game) + "\n").encode("utf-8"))
+
+
+class GameStore:
+    """
+    The games of a store file for one code version, loaded in memory.
+    A game is a dict with at least the keys red, yellow, seed and index.
+    """
+
+    def __init__(self, path: str, version: str = None) -> None:
+        self.path = path
+        self.version = get_code_version() if version is None else version
+        self.__games = {}
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                game = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line of a crashed run
+                continue
+            if game.get("version") == self.version:
+                self.__games[self.__key(game)] = game
+        if text and not text.endswith("\n"):
+            # the next games must not be appended to the truncated line
+            append_to_file(path, b"\n")
+
+    def __len__(self) -> int:
+        return len(self.__games)
+
+    @staticmethod
+    def __key(game: dict):
+        return game["red"], game["yellow"], game["seed"], game["index"]
+
+    def get(self, red: str, yellow: str, seed: int, index: int) -> Optional[dict]:
+        """Returns the stored game, or None if it was not played with this version."""
+        return self.__games.get((red, yellow, seed, index))
+
+    def add(self, game: dict) -> None:
+        """Stores a game of this version and appends it to the file."""
+        game = dict(game, version=self.version)
+        self.__games[self.__key(game)] = game
+        append_game(self.path, game)
@@ -0,0 +1,68 @@
+# Latency of the moves: percentiles by ply and fixed-bucket histograms of the
+# move times of a player, and a JSON lines trace of the moves.
+#
+# The plies are counted from 1 for the first move of red, so the moves of red
+# are the odd plies and the moves of yellow the even ones.
+
+import json
+import numpy as np
+from file_tools import append_to_file
+
+# The upper bounds (in seconds) of the histogram buckets, plus one last bucket
+# for the slower moves
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+PERCENTILES = (50, 90, 99)
+
+
+def get_percentiles(times) -> dict:
+    """Returns the PERCENTILES (p50...) and the max of the times, 0 without times."""
+    if len(times) == 0:
+        return {**{f"p{q}": 0.0 for q in PERCENTILES}, "max": 0.0}
+    values = np.percentile(times, PERCENTILES)
+    return {**{f"p{q}": float(v) for q, v in zip(PERCENTILES, values)}, "max": max(times)}
+
+
+def get_histogram(times) -> list:
+    """Returns the number of times in each bucket of LATENCY_BUCKETS (and above)."""
+    indexes = np.searchsorted(LATENCY_BUCKETS, times)
+    return np.bincount(indexes, minlength=len(LATENCY_BUCKETS) + 1).tolist()
+
+
+def get_latency(games_times, first_ply: int) -> dict:
+    """
+    Returns the percentiles, the histogram and the percentiles by ply ("by_ply")
+    of the move times of a player. games_times has the list of the move times
+    of each game, and first_ply is the ply of the first move (1 for red, 2 for
+    yellow).
+    """
+    times = [t for game_times in games_times for t in game_times]
+    ply_times = {}
+    for game_times in games_times:
+        for i, t in enumerate(game_times):
+            ply_times.setdefault(first_ply + 2 * i, []).append(t)
+    return {
+        **get_percentiles(times),
+        "histogram": get_histogram(times),
+        "by_ply": {ply: get_percentiles(ply_times[ply]) for ply in sorted(ply_times)},
+    }
+
+
+# Trace -------------------------------------------------------------------------
+
+
+def trace_move(ply: int, symbol: str, column: int, time: float, stats=None) -> dict:
+    """Returns the trace of a move, with the nodes and the depth of its SearchStats."""
+    move = {"ply": ply, "symbol": symbol, "column": column, "time": time}
+    if stats is not None:
+        move["nodes"] = stats.nodes
+        move["depth"] = stats.max_depth
+    return move
+
+
+def append_trace(path: str, moves, **keys) -> None:
+    """
+    Appends the moves (trace_move) of a game to the trace, one line per move
+    with the keys (players, seed...), see append_to_file.
+    """
+    lines = "".join(json.dumps({**keys, **move}) + "\n" for move in moves)
+    append_to_file(path, lines.encode("utf-8"))
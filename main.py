@@ -20,7 +20,7 @@ def input_int(message: str):
     return res
 
 
-def build_ia_player() -> Player:
+def build_ia_player(ponder: bool = False) -> Player:
     while True:
         print("Please select AI's level : ")
         print("1) Easy")
@@ -30,11 +30,11 @@ def build_ia_player() -> Player:
         n = input_int("Please select AI's difficulty : ")
 
         if n == 1:
-            return EasyPlayer()
+            return EasyPlayer(ponder=ponder)
         elif n == 2:
-            return MediumPlayer()
+            return MediumPlayer(ponder=ponder)
         elif n == 3:
-            return HardPlayer()
+            return HardPlayer(ponder=ponder)
         else:
             print("This level is not valid !")
 
@@ -51,7 +51,8 @@ def create_players() -> Tuple[Player, Player]:
         if n == 1:
             return HumanPlayer(), HumanPlayer()
         elif n == 2:
-            return HumanPlayer(), build_ia_player()
+            # the AI searches during the turn of the human
+            return HumanPlayer(), build_ia_player(ponder=True)
         elif n == 3:
             return build_ia_player(), build_ia_player()
         else:
@@ -0,0 +1,190 @@
+# Search benchmark: run each algorithm / eval / actions combination on a fixed
+# set of positions and compare the results with a baseline file.
+#
+# python3 main_bench.py --output bench.json
+# python3 main_bench.py --baseline bench.json --threshold 0.1
+#
+# The searches are seeded, so the node counts are exact and fail the command
+# beyond --threshold. The speed (nodes per second) depends on the machine load:
+# it is the best of several runs and fails beyond the looser --speed-threshold.
+
+import argparse
+import json
+import random
+import sys
+from math import inf
+from time import perf_counter
+from board import Board
+from minimax import minimax
+from alpha_beta import alphabeta
+from pvs import pvs
+from search_stats import SearchStats
+import eval_tools
+
+# Configuration -----------------------
+SEED = 42
+EVALS = ("eval_1", "eval_2", "eval_3", "eval_4", "eval_5")
+BOARD_ACTIONS = (
+    "board_actions_1",
+    "board_actions_2",
+    "board_actions_3",
+    "board_actions_4",
+    "board_actions_5",
+)
+ALGOS = {"minimax": minimax, "alphabeta": alphabeta, "pvs": pvs}
+DEPTHS = {"minimax": 3, "alphabeta": 5, "pvs": 5}
+THRESHOLD = 0.1
+SPEED_THRESHOLD = 0.25
+REPEAT = 3
+# The fast configurations are run again until this time (seconds) is spent
+MIN_TIME = 1.0
+
+# The positions, as the columns played from the empty board
+POSITIONS = {
+    "opening_1": "3",
+    "opening_2": "5264",
+    "opening_3": "526401",
+    "middlegame_1": "0313443033",
+    "middlegame_2": "03134430336030",
+    "middlegame_3": "1342155143112625",
+    "endgame_1": "142666611460313121602035",
+    "endgame_2": "5515505211501634431142266036",
+    "endgame_3": "55155052115016344311422660363363",
+}
+
+
+# Utilities ---------------------------
+
+
+def get_position(moves: str):
+    """Returns (board, symbol to play) after the moves, red always starts."""
+    board = Board.from_moves(int(column) for column in moves)
+    return board, board.get_symbol_to_play()
+
+
+def bench(algo: str, eval_name: str, actions_name: str, depth: int, repeat: int) -> dict:
+    """
+    Searches every position with this configuration and returns the number of
+    nodes, the time (the best of at least repeat runs, and MIN_TIME seconds)
+    and the nodes per second.
+    The random generator is seeded for each position, so the random actions
+    are the same on each run. The nodes are counted by one more run with a
+    SearchStats, the timed runs have none (its wrappers cost time).
+    """
+    search = ALGOS[algo]
+    eval_fx = getattr(eval_tools, eval_name)
+    actions_fx = getattr(eval_tools, actions_name)
+    stats = SearchStats()
+    for moves in POSITIONS.values():
+        board, symbol = get_position(moves)
+        random.seed(SEED)
+        search(board, symbol, depth, eval_fx, actions_fx, stats=stats)
+    duration = inf
+    total_duration = 0.0
+    runs = 0
+    while runs < repeat or total_duration < MIN_TIME:
+        run_duration = 0.0
+        for moves in POSITIONS.values():
+            board, symbol = get_position(moves)
+            random.seed(SEED)
+            before = perf_counter()
+            search(board, symbol, depth, eval_fx, actions_fx)
+            run_duration += perf_counter() - before
+        duration = min(duration, run_duration)
+        total_duration += run_duration
+        runs += 1
+    return {
+        "nodes": stats.nodes,
+        "leaves": stats.leaves,
+        "time": duration,
+        "nodes_per_sec": stats.nodes / duration,
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float):
+    """
+    Yields a message for each configuration of the baseline which searches
+    more nodes by more than threshold.
+    """
+    for name, old in baseline.items():
+        new = results.get(name)
+        if new is not None and new["nodes"] > old["nodes"] * (1 + threshold):
+            yield f"{name}: {new['nodes']} nodes (baseline: {old['nodes']})"
+
+
+def slowdowns(results: dict, baseline: dict, threshold: float):
+    """
+    Yields a message for each configuration of the baseline which is slower
+    (nodes per second) by more than threshold.
+    """
+    for name, old in baseline.items():
+        new = results.get(name)
+        if new is not None and new["nodes_per_sec"] < old["nodes_per_sec"] * (1 - threshold):
+            yield (
+                f"{name}: {new['nodes_per_sec']:.0f} nodes/s"
+                f" (baseline: {old['nodes_per_sec']:.0f})"
+            )
+
+
+# Script ------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 Bench",
+        description="Measure the speed of the searches on a fixed set of positions.",
+    )
+    parser.add_argument("--evals", nargs="+", default=EVALS)
+    parser.add_argument("--board-actions", nargs="+", default=BOARD_ACTIONS)
+    parser.add_argument("--algos", nargs="+", choices=tuple(ALGOS), default=tuple(ALGOS))
+    parser.add_argument(
+        "--output", type=str, default="bench.json", help="The results file."
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=None, help="The results file to compare with."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="The accepted increase of the nodes (0.1 for 10%%).",
+    )
+    parser.add_argument(
+        "--speed-threshold",
+        type=float,
+        default=SPEED_THRESHOLD,
+        help="The accepted decrease of the nodes per second (0.25 for 25%%).",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=REPEAT, help="Keep the best time of N runs."
+    )
+    args = parser.parse_args()
+
+    # read before the output, which can be the same file
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for algo in args.algos:
+        depth = DEPTHS[algo]
+        for eval_name in args.evals:
+            for actions_name in args.board_actions:
+                name = f"{algo}:{eval_name}:{actions_name}:{depth}"
+                results[name] = bench(algo, eval_name, actions_name, depth, args.repeat)
+                print(
+                    f"{name} | nodes: {results[name]['nodes']}"
+                    f" | {results[name]['nodes_per_sec']:.0f} nodes/s"
+                    f" | {results[name]['time']:.3f}s"
+                )
+    with open(args.output, mode="w", encoding="utf-8") as f:
+        json.dump({"seed": SEED, "results": results}, f, indent=2)
+
+    if baseline is not None:
+        messages = list(regressions(results, baseline, args.threshold))
+        messages += slowdowns(results, baseline, args.speed_threshold)
+        for message in messages:
+            print(f"REGRESSION {message}")
+        if messages:
+            sys.exit(1)
+        print("No regression")
@@ -0,0 +1,53 @@
+# Compare the speed of the leaf evaluations with their NumPy versions.
+
+import random
+import time
+from board import Board
+import eval_tools
+
+# Configuration -----------------------
+SEED = 42
+NB_POSITIONS = 500
+PAIRS = (("eval_3", "eval_3_np"), ("eval_4", "eval_4_np"))
+
+
+# Utilities ---------------------------
+
+
+def random_positions(nb_positions: int):
+    """Returns positions from random games, the terminal ones are skipped."""
+    positions = []
+    while len(positions) < nb_positions:
+        board = Board()
+        symbol = Board.RED
+        while not board.is_full():
+            columns = [c for c in range(board.NB_COLUMNS) if not board.is_column_full(c)]
+            board.put_symbol(symbol, random.choice(columns))
+            if board.is_winner(symbol):
+                break
+            positions.append((board.copy(), symbol))
+            symbol = eval_tools.get_opponent(symbol)
+    return positions[:nb_positions]
+
+
+def bench(eval_fx, positions):
+    """Returns the scores and the time in seconds to evaluate all the positions."""
+    before = time.perf_counter()
+    scores = [eval_fx(board, symbol, 0) for board, symbol in positions]
+    return scores, time.perf_counter() - before
+
+
+# Script ------------------------------
+
+random.seed(SEED)
+positions = random_positions(NB_POSITIONS)
+
+for name, name_np in PAIRS:
+    scores, duration = bench(getattr(eval_tools, name), positions)
+    scores_np, duration_np = bench(getattr(eval_tools, name_np), positions)
+    assert scores == scores_np, f"{name_np} does not return the same scores as {name}!"
+    print(
+        f"{name}: {duration / NB_POSITIONS * 1e6:.1f}us/eval | "
+        f"{name_np}: {duration_np / NB_POSITIONS * 1e6:.1f}us/eval | "
+        f"speedup: x{duration / duration_np:.2f}"
+    )
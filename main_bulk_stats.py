@@ -1,10 +1,7 @@
 # Run all stats in one command!
 # Take a coffee;)
 
-from multiprocessing import Pool
-import subprocess
-import os
-import time
+from tournament import run_tournament, plot_tournament
 
 # Configuration -----------------------
 EVALS = range(1, 4 + 1)
@@ -13,12 +10,18 @@ ALGOS = ("AB", "MM")
 DEPTHS = (2, 4, 6)
 NB_GAMES = 10
 OUT_DIR = "stats/"
+OUT_RESULTS = "stats.json"
+PLOT = True
+# The cProfile file of the games, None to disable
+PROFILE = None
+# The seed of the games, and the store of the finished games (None to disable):
+# a new run only plays the games which are not in the store
+SEED = 0
+STORE = "stats_games.jsonl"
 
 # Others constants
 EVAL_PREFIX = "eval_"
 BOARD_ACTIONS_PREFIX = "board_actions_"
-PYTHON_BIN = "python3"
-STATS_PY = "main_stats.py"
 
 
 # Utilities ---------------------------
@@ -48,18 +51,6 @@ def settings_players_generator():
             yield player1, player2
 
 
-def run_stats(players):
-    player1, player2 = players
-    output_file = OUT_DIR + player1 + "_" + player2
-    before = time.time()
-    p = subprocess.run(
-        [PYTHON_BIN, STATS_PY, "--ai-level", player1, player2, "--nb-games", str(NB_GAMES), "--output", output_file]
-    )
-    p.check_returncode()
-    with open(output_file + ".txt", mode="w", encoding="utf-8") as f:
-        f.write(str(time.time() - before))
-
-
 # Script ------------------------------
 
 # eval, depth, eval, depth
@@ -117,15 +108,15 @@ def to_config(games):
         yield player1_str, player2_str
 
 
-os.makedirs(OUT_DIR, exist_ok=True)
-
-pool = Pool()
-
 print("Start...")
 
-for game in to_config(games):
+matchups = list(to_config(games))
+for game in matchups:
     print(game)
 
-pool.map(run_stats, to_config(games))
+run_tournament(matchups, NB_GAMES, OUT_RESULTS, profile=PROFILE, seed=SEED, store_path=STORE)
+
+if PLOT:
+    plot_tournament(OUT_RESULTS, OUT_DIR)
 
 print("End!")
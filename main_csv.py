@@ -1,15 +1,19 @@
-import pandas as pd
-from math import pow
-from random import shuffle
+import argparse
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from player import EvalPlayer
+from search_stats import SearchStats
 import eval_tools
 from game import Game
 from board import Board
-from threading import RLock
 from time import time
+from profiling import profiled, clear_profiles, merge_profiles, PROFILE_TOP
+from game_store import GameStore, append_game, get_game_seed, seed_game
+from latency import get_latency, trace_move, append_trace
 
 
-# Configuration
+# Default configuration
 
 EVALS = (1, 2,)
 BOARD_ACTIONS = (2,)
@@ -17,16 +21,40 @@ ALGOS = ("AB", "MM")
 DEPTHS = (2, 3, 4,)
 NB_GAMES = 50
 OUT_CSV = "stats2.csv"
-
-# Global variable
-
-TOTAL = int(pow(len(EVALS) * len(BOARD_ACTIONS) * len(ALGOS) * len(DEPTHS), 2))
-
-colum_name_list = ("Al", "Ev", "Ba", "De", "Tm") * 2 + ("win", "draw")
-
-df = pd.DataFrame(columns=colum_name_list)
-
-lock = RLock()
+SEED = 0
+
+# Columns
+
+# Search stats of a player, per move: nodes, leaves, cut offs, part of the cut
+# offs on the first move, effective branching factor, max depth (of all the
+# moves), time in the eval function and in the actions function
+search_column_list = ("Nd", "Lf", "Ct", "Cf", "Bf", "Md", "Te", "Ta")
+
+# Latency of the moves of a player: p50, p90, p99 and max of the move times,
+# histogram (counts of the latency.LATENCY_BUCKETS, joined by "|") and the same
+# percentiles by ply (JSON: {ply: [p50, p90, p99, max]})
+latency_column_list = ("L50", "L90", "L99", "Lmx", "Lh", "Lp")
+
+colum_name_list = (
+    ("Al", "Ev", "Ba", "De", "Tm") * 2
+    + ("win", "draw")
+    + search_column_list * 2
+    + latency_column_list * 2
+)
+
+# The Parquet columns must be unique: the red ones end with _r, the yellow ones with _y
+parquet_column_list = (
+    tuple(f"{c}_r" for c in colum_name_list[:5])
+    + tuple(f"{c}_y" for c in colum_name_list[5:10])
+    + colum_name_list[10:12]
+    + tuple(f"{c}_r" for c in search_column_list)
+    + tuple(f"{c}_y" for c in search_column_list)
+    + tuple(f"{c}_r" for c in latency_column_list)
+    + tuple(f"{c}_y" for c in latency_column_list)
+)
+
+# Number of rows per Parquet row group
+PARQUET_BATCH = 64
 
 # Utility -----------------------------------------------------------
 
@@ -43,75 +71,310 @@ def get_actions_fx(board_actions):
     return getattr(eval_tools, f"board_actions_{board_actions}")
 
 
+def get_player_spec(algo, eval_n, board_actions, depth):
+    """Returns the name of the player for get_player of player.py."""
+    spec = f"eval_{eval_n}:board_actions_{board_actions}:{depth}"
+    return spec + ":m" if algo == "MM" else spec
+
+
 def get_player(algo, eval_n, board_actions, depth):
     use_minimax = algo == "MM"
     eval_fx = get_eval_fx(eval_n)
     actions_fx = get_actions_fx(board_actions)
-    return EvalPlayer("Test", eval_fx, actions_fx, depth, use_minimax)
+    return EvalPlayer("Test", eval_fx, actions_fx, depth, use_minimax, search_stats=True)
+
+
+def search_columns(stats: SearchStats):
+    """Returns the values of search_column_list for the searches of a player."""
+    n = max(stats.nb_searches, 1)
+    return (
+        stats.nodes / n,
+        stats.leaves / n,
+        stats.cutoffs / n,
+        stats.first_cutoff_rate,
+        stats.ebf,
+        stats.max_depth,
+        stats.eval_time / n,
+        stats.actions_time / n,
+    )
+
+
+def latency_columns(latency: dict):
+    """Returns the values of latency_column_list for a latency.get_latency."""
+    by_ply = {
+        ply: [p["p50"], p["p90"], p["p99"], p["max"]] for ply, p in latency["by_ply"].items()
+    }
+    return (
+        latency["p50"],
+        latency["p90"],
+        latency["p99"],
+        latency["max"],
+        "|".join(map(str, latency["histogram"])),
+        json.dumps(by_ply, separators=(",", ":")),
+    )
 
 
-def player_config_gen():
-    for eval_n in EVALS:
-        for board_actions in BOARD_ACTIONS:
-            for algo in ALGOS:
-                for depth in DEPTHS:
+def player_config_gen(evals, board_actions_list, algos, depths):
+    for eval_n in evals:
+        for board_actions in board_actions_list:
+            for algo in algos:
+                for depth in depths:
                     yield algo, eval_n, board_actions, depth
 
 
-def players_configs_gen():
-    for player_r in player_config_gen():
-        for player_y in player_config_gen():
+def players_configs_gen(evals, board_actions_list, algos, depths):
+    for player_r in player_config_gen(evals, board_actions_list, algos, depths):
+        for player_y in player_config_gen(evals, board_actions_list, algos, depths):
             yield player_r, player_y
 
 
-def stats_games(player_r, player_y):
+def play_game(player_r, player_y, game_seed: str, trace=None) -> dict:
+    """
+    Plays a seeded game and returns its winner, move times and search stats.
+    With trace, a list, the moves are added to it (see latency.trace_move).
+    """
+    seed_game(game_seed, player_r, player_y)
+    game = Game(player_r, player_y)
+    times_r = []
+    times_y = []
+    search_r = SearchStats()
+    search_y = SearchStats()
+    # game loop
+    j = 0
+    while not game.has_ended():
+        before = time()
+        # play
+        game.player_turn()
+        # save the time
+        diff = time() - before
+        if j % 2 == 0:
+            symbol, player, times, search = Board.RED, player_r, times_r, search_r
+        else:
+            symbol, player, times, search = Board.YELLOW, player_y, times_y, search_y
+        times.append(diff)
+        search.add(player.last_search_stats)
+        j += 1
+        if trace is not None:
+            column = game.board.get_last_move()
+            trace.append(trace_move(j, symbol, column, diff, player.last_search_stats))
+    winner = None
+    if game.is_winner(Board.RED):
+        winner = Board.RED
+    elif game.is_winner(Board.YELLOW):
+        winner = Board.YELLOW
+    return {
+        "winner": winner,
+        "times_r": times_r,
+        "times_y": times_y,
+        "search_r": search_r.to_dict(),
+        "search_y": search_y.to_dict(),
+    }
+
+
+def stats_games(games):
     r_win = 0
     draw = 0
     times_r = []
     times_y = []
-
-    for i in range(NB_GAMES):
-        game = Game(player_r, player_y)
-        # game loop
-        j = 0
-        while not game.has_ended():
-            before = time()
-            # play
-            game.player_turn()
-            # save the time
-            diff = time() - before
-            if j % 2 == 0:
-                times_r.append(diff)
-            else:
-                times_y.append(diff)
-            j += 1
+    search_r = SearchStats()
+    search_y = SearchStats()
+
+    for game in games:
+        times_r += game["times_r"]
+        times_y += game["times_y"]
+        search_r.add(SearchStats.from_dict(game["search_r"]))
+        search_y.add(SearchStats.from_dict(game["search_y"]))
         # check win and update scores
-        if game.is_winner(Board.RED):
+        if game["winner"] == Board.RED:
             r_win += 1
-        elif not game.is_winner(Board.YELLOW):
+        elif game["winner"] is None:
             draw += 1
 
-    return r_win / NB_GAMES, draw / NB_GAMES, mean(times_r), mean(times_y)
+    nb_games = len(games)
+    return (
+        r_win / nb_games,
+        draw / nb_games,
+        mean(times_r),
+        mean(times_y),
+        search_r,
+        search_y,
+        get_latency([game["times_r"] for game in games], 1),
+        get_latency([game["times_y"] for game in games], 2),
+    )
 
 
-def stats_maker(args):
-    player_r, player_y = args
-    r_win, draw, time_r, times_y = stats_games(
-        get_player(*player_r), get_player(*player_y)
+def stats_maker(
+    player_r, player_y, games, seed, store_path=None, version=None, trace_path=None
+):
+    """
+    Plays the games of a matchup (in a worker) and returns its row.
+    games has one item per game: the stored game, or None to play it. With
+    store_path, each game played is appended to this game store. With
+    trace_path, the moves of the games played are appended to this trace.
+    """
+    red = get_player_spec(*player_r)
+    yellow = get_player_spec(*player_y)
+    players = None
+    games = list(games)
+    for index, game in enumerate(games):
+        if game is not None:
+            continue
+        # the players are only built if a game is missing
+        if players is None:
+            players = get_player(*player_r), get_player(*player_y)
+        trace = [] if trace_path is not None else None
+        game = play_game(*players, get_game_seed(seed, red, yellow, index), trace)
+        games[index] = game
+        if trace_path is not None:
+            append_trace(trace_path, trace, red=red, yellow=yellow, seed=seed, index=index)
+        if store_path is not None:
+            game = dict(game, red=red, yellow=yellow, seed=seed, index=index, version=version)
+            append_game(store_path, game)
+    r_win, draw, time_r, times_y, search_r, search_y, latency_r, latency_y = stats_games(games)
+    return (
+        player_r
+        + (time_r,)
+        + player_y
+        + (times_y,)
+        + (r_win, draw)
+        + search_columns(search_r)
+        + search_columns(search_y)
+        + latency_columns(latency_r)
+        + latency_columns(latency_y)
     )
-    with lock:
-        df.loc[len(df)] = player_r + (time_r,) + player_y + (times_y,) + (r_win, draw)
-        return f"{len(df)}/{TOTAL} | {player_r} VS {player_y}"
 
 
-# Script ------------------------------------------------------------
+class ParquetRows:
+    """Writes the rows in a Parquet file, by row groups of PARQUET_BATCH rows."""
+
+    def __init__(self, path: str) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("The Parquet output needs pyarrow: pip install pyarrow")
+        self.__pa = pa
+        self.__pq = pq
+        self.__path = path
+        self.__writer = None
+        self.__rows = []
+
+    def write(self, row) -> None:
+        self.__rows.append(row)
+        if len(self.__rows) >= PARQUET_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.__rows:
+            return
+        columns = list(zip(*self.__rows))
+        table = self.__pa.table(
+            {name: list(values) for name, values in zip(parquet_column_list, columns)}
+        )
+        if self.__writer is None:
+            self.__writer = self.__pq.ParquetWriter(self.__path, table.schema)
+        self.__writer.write_table(table)
+        self.__rows = []
+
+    def close(self) -> None:
+        self.flush()
+        if self.__writer is not None:
+            self.__writer.close()
 
-args = list(players_configs_gen())
-shuffle(args)
 
-print("START")
-for config in players_configs_gen():
-    print(stats_maker(config))
-print("FINISH") 
+# Script ------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 CSV Stats",
+        description="Play all the matchups of a grid of AI and write one row per matchup.",
+    )
+    parser.add_argument("--evals", type=int, nargs="+", default=EVALS)
+    parser.add_argument("--board-actions", type=int, nargs="+", default=BOARD_ACTIONS)
+    parser.add_argument("--algos", nargs="+", choices=("AB", "MM"), default=ALGOS)
+    parser.add_argument("--depths", type=int, nargs="+", default=DEPTHS)
+    parser.add_argument("--nb-games", type=int, default=NB_GAMES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", type=str, default=OUT_CSV, help="The CSV file.")
+    parser.add_argument(
+        "--parquet", type=str, default=None, help="Also write a Parquet file."
+    )
+    parser.add_argument("--seed", type=int, default=SEED, help="The seed of the games.")
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="The game store (JSON lines): the games in it are not played again.",
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None, help="Append the moves to this JSON lines trace."
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="The cProfile file of the games (open it with snakeviz).",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=PROFILE_TOP,
+        help="The number of functions printed by cumulative time.",
+    )
+    args = parser.parse_args()
 
-df.to_csv(OUT_CSV)
+    configs = list(
+        players_configs_gen(args.evals, args.board_actions, args.algos, args.depths)
+    )
+    total = len(configs)
+    parquet = ParquetRows(args.parquet) if args.parquet else None
+    store = GameStore(args.store) if args.store is not None else None
+
+    def stored_games(player_r, player_y):
+        """Returns the games of the matchup in the store, None for the missing ones."""
+        if store is None:
+            return [None] * args.nb_games
+        red = get_player_spec(*player_r)
+        yellow = get_player_spec(*player_y)
+        games = [store.get(red, yellow, args.seed, i) for i in range(args.nb_games)]
+        # the games of tournament.py have no search stats, they are played again
+        return [game if game and "search_r" in game else None for game in games]
+
+    if args.profile is not None:
+        clear_profiles(args.profile)
+
+    print("START")
+    with open(args.output, mode="w", newline="", encoding="utf-8") as f, ProcessPoolExecutor(
+        args.workers
+    ) as pool:
+        writer = csv.writer(f)
+        writer.writerow(("",) + colum_name_list)
+        futures = {
+            pool.submit(
+                profiled,
+                args.profile,
+                stats_maker,
+                player_r,
+                player_y,
+                stored_games(player_r, player_y),
+                args.seed,
+                args.store,
+                store.version if store is not None else None,
+                args.trace,
+            ): (player_r, player_y)
+            for player_r, player_y in configs
+        }
+        # each row is written as soon as its matchup is done
+        for i, future in enumerate(as_completed(futures)):
+            row = future.result()
+            writer.writerow((i,) + row)
+            f.flush()
+            if parquet is not None:
+                parquet.write(row)
+            player_r, player_y = futures[future]
+            print(f"{i + 1}/{total} | {player_r} VS {player_y}")
+    if parquet is not None:
+        parquet.close()
+    if args.profile is not None:
+        merge_profiles(args.profile, args.profile_top)
+    print("FINISH")
@@ -1,28 +1,17 @@
 import argparse
 from typing import Tuple
 import matplotlib.pyplot as plt
-from player import EvalPlayer, EasyPlayer, MediumPlayer, HardPlayer
-import eval_tools
+from player import EasyPlayer, MediumPlayer, HardPlayer, get_player
+from tournament import plot_stats
 from game import Game
 from board import Board
+from profiling import profiled, clear_profiles, merge_profiles, PROFILE_TOP
 import time
-import re
 
 
 # Utilities ----------------------------------------------------------------------
 
 
-def plot_stats(ax, title: str, r_nb_win: int, y_nb_win: int, nb_games: int):
-    draw_count = nb_games - (r_nb_win + y_nb_win)
-    y = [r_nb_win, y_nb_win]
-    colors = ["red", "yellow"]
-    if draw_count > 0:
-        y.append(draw_count)
-        colors.append("grey")
-    ax.pie(y, colors=colors)
-    ax.set_title(title, fontsize=7)
-
-
 def stats_games(player_r, player_y, nb_games: int) -> Tuple[int, int]:
     r_win = 0
     y_win = 0
@@ -44,20 +33,11 @@ def stats_games(player_r, player_y, nb_games: int) -> Tuple[int, int]:
     return r_win, y_win
 
 
-def get_player(name: str):
-    pattern = "^(?P<eval>\w+):(?P<action>\w+):(?P<depth>\d)(:(?P<m>m))?$"
-    matcher = re.search(pattern, name)
-    if matcher:
-        res = matcher.groupdict()
-        eval_fx = getattr(eval_tools, res["eval"])
-        action_fx = getattr(eval_tools, res["action"])
-        depth = int(res["depth"])
-        use_minimax = res["m"] == "m"
-        name = "{}:{}".format(res["eval"], res["action"])
-        return EvalPlayer(name, eval_fx, action_fx, depth, use_minimax)
-    else:
-        player_map = {"easy": EasyPlayer, "medium": MediumPlayer, "hard": HardPlayer}
-        return player_map[name]()
+def print_tt_stats(player):
+    """Prints the counters of the transposition table of the player, if any."""
+    tt = getattr(player, "transposition_table", None)
+    if tt is not None:
+        print(f"{player} transposition table: {tt.stats()}")
 
 
 # Define parser ----------------------------------------------------------------
@@ -91,6 +71,38 @@ parser.add_argument(
     help="The path to the generated image.",
 )
 
+# The size of the transposition tables
+parser.add_argument(
+    "--tt-size",
+    type=int,
+    default=None,
+    help="The number of entries of the AI transposition tables (disabled by default).",
+)
+
+# The opening book of the AI
+parser.add_argument(
+    "--book",
+    type=str,
+    default=None,
+    help="The opening book file of the AI (see opening_book.py).",
+)
+
+# Profile the games (not the plots)
+parser.add_argument(
+    "--profile",
+    type=str,
+    default=None,
+    help="The cProfile file of the games (open it with snakeviz).",
+)
+
+# The number of functions printed from the profile
+parser.add_argument(
+    "--profile-top",
+    type=int,
+    default=PROFILE_TOP,
+    help="The number of functions printed by cumulative time.",
+)
+
 # Process Argument -------------------------------------------------------------
 
 args = parser.parse_args()
@@ -98,11 +110,21 @@ args = parser.parse_args()
 nb_games = args.nb_games
 ai_level = args.ai_level
 output_path = args.output
+tt_size = args.tt_size
+book = args.book
+profile = args.profile
+
+if profile is not None:
+    clear_profiles(profile)
 
 # Compute Stats ----------------------------------------------------------------
 
 # define all instances of players
-player_map = {"easy": EasyPlayer(), "medium": MediumPlayer(), "hard": HardPlayer()}
+player_map = {
+    "easy": EasyPlayer(tt_size=tt_size, book=book),
+    "medium": MediumPlayer(tt_size=tt_size, book=book),
+    "hard": HardPlayer(tt_size=tt_size, book=book),
+}
 
 if ai_level is None:
     # Stats all ai
@@ -113,7 +135,11 @@ if ai_level is None:
             if level_r == level_y:
                 continue
             print(f"Stats with {player_r} (red) and {player_y} (yellow)...")
-            r_win_count, y_win_count = stats_games(player_r, player_y, nb_games)
+            r_win_count, y_win_count = profiled(
+                profile, stats_games, player_r, player_y, nb_games
+            )
+            print_tt_stats(player_r)
+            print_tt_stats(player_y)
             plot_stats(
                 axs[x, y],
                 f"{player_r} (red) vs {player_y} (yellow)",
@@ -128,10 +154,14 @@ if ai_level is None:
     plt.savefig(output_path)
 else:
     # Stats just on specified
-    players = tuple(map(lambda e: get_player(e), ai_level))
+    players = tuple(map(lambda e: get_player(e, tt_size=tt_size, book=book), ai_level))
     player_r = players[0]
     player_y = players[1]
-    r_win_count, y_win_count = stats_games(player_r, player_y, nb_games)
+    r_win_count, y_win_count = profiled(
+        profile, stats_games, player_r, player_y, nb_games
+    )
+    print_tt_stats(player_r)
+    print_tt_stats(player_y)
     fig, ax = plt.subplots()
     plot_stats(
         ax,
@@ -142,3 +172,6 @@ else:
     )
     fig.suptitle("AI Stats for Connect 4")
     plt.savefig(output_path)
+
+if profile is not None:
+    merge_profiles(profile, args.profile_top)
@@ -3,17 +3,27 @@ from math import inf
 from random import randint
 from board import Board
 from eval_tools import terminal_test, get_opponent
+from search_stats import SearchStats
 
 
-def minimax(board: Board, symbol: str, depth: int, eval_fx, actions_fx) -> int:
-    """Returns the best column to play the next move."""
-    u, best_action = max_value(board, symbol, depth, eval_fx, actions_fx)
+def minimax(
+    board: Board, symbol: str, depth: int, eval_fx, actions_fx, stats: SearchStats = None
+) -> int:
+    """
+    Returns the best column to play the next move.
+    With stats, the counters of the search are added to it.
+    """
+    if stats is not None:
+        eval_fx, actions_fx = stats.wrap(board, eval_fx, actions_fx)
+    u, best_action = max_value(board, symbol, depth, eval_fx, actions_fx, stats)
     return best_action
 
 
 def max_value(
-    board: Board, symbol: str, depth: int, eval_fx, actions_fx
+    board: Board, symbol: str, depth: int, eval_fx, actions_fx, stats=None
 ) -> Tuple[float, int]:
+    if stats is not None:
+        stats.nodes += 1
     # check the terminal test
     if terminal_test(board, depth):
         return eval_fx(board, symbol, depth), 0
@@ -24,7 +34,7 @@ def max_value(
         # play the action
         board.put_symbol(symbol, action)
         # compute the utility score of this action
-        v_bis, _ = min_value(board, symbol, depth - 1, eval_fx, actions_fx)
+        v_bis, _ = min_value(board, symbol, depth - 1, eval_fx, actions_fx, stats)
         # undo the action
         board.undo()
         # update the best move if the utility is better
@@ -36,7 +46,7 @@ def max_value(
 
 
 def min_value(
-    board: Board, symbol: str, depth: int, eval_fx, actions_fx
+    board: Board, symbol: str, depth: int, eval_fx, actions_fx, stats=None
 ) -> Tuple[float, int]:
     # "symbol" here is still the maximizing player.
     # If this config is terminal, we need to evaluate it for this player,
@@ -47,6 +57,8 @@ def min_value(
 
     opponent = get_opponent(symbol)
 
+    if stats is not None:
+        stats.nodes += 1
     # check the terminal test
     if terminal_test(board, depth):
         return -eval_fx(board, opponent, depth), 0
@@ -57,7 +69,7 @@ def min_value(
         # play the action
         board.put_symbol(opponent, action)
         # compute the utility score of this action
-        v_bis, _ = max_value(board, symbol, depth - 1, eval_fx, actions_fx)
+        v_bis, _ = max_value(board, symbol, depth - 1, eval_fx, actions_fx, stats)
         # undo the action
         board.undo()
         # update the best move if the utility is better
@@ -0,0 +1,127 @@
+# Opening book: the best move of the first positions of the game, computed once
+# with a deep search and stored in a sorted binary file.
+#
+# python3 opening_book.py --plies 4 --depth 6 --output book.bin
+
+import argparse
+import mmap
+import struct
+from math import inf
+from typing import Optional, Tuple
+from board import Board, mirror_column
+from alpha_beta import max_value
+from transposition import TranspositionTable
+import eval_tools
+
+# A record: position key, best move, score (for the player to move).
+# The key is Board.get_canonical_key, a position and its mirror share a record
+# and the move of a mirrored key is the mirror move.
+RECORD = struct.Struct("<Qbd")
+
+
+def book_positions(max_plies: int):
+    """
+    Yields each position with less than max_plies moves once, skipping the
+    finished games and the mirrors of the positions already yielded.
+    The board is shared: copy it to keep it.
+    """
+    seen = set()
+    board = Board()
+
+    def explore():
+        key, _ = board.get_canonical_key()
+        if key in seen:
+            return
+        seen.add(key)
+        yield board
+        if len(board.history) + 1 >= max_plies:
+            return
+        symbol = board.get_symbol_to_play()
+        for column in range(board.NB_COLUMNS):
+            if board.is_column_full(column):
+                continue
+            board.put_symbol(symbol, column)
+            if not board.is_winner(symbol):
+                yield from explore()
+            board.undo()
+
+    yield from explore()
+
+
+def build_book(path: str, max_plies: int, depth: int, eval_fx, actions_fx) -> int:
+    """
+    Searches the best move of every position with less than max_plies moves and
+    writes the book file. Returns the number of records.
+    """
+    tt = TranspositionTable(1 << 20)
+    records = []
+    for board in book_positions(max_plies):
+        symbol = board.get_symbol_to_play()
+        score, move = max_value(
+            board, symbol, depth, -inf, +inf, eval_fx, actions_fx, tt, list(actions_fx(board))
+        )
+        key, mirrored = board.get_canonical_key()
+        records.append((key, mirror_column(move) if mirrored else move, score))
+    records.sort()
+    with open(path, mode="wb") as f:
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+
+class OpeningBook:
+    """A book file opened with mmap, searched by dichotomy on the position keys."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, mode="rb") as f:
+            self.__data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__size = len(self.__data) // RECORD.size
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def lookup(self, board: Board) -> Optional[Tuple[int, float]]:
+        """Returns the (move, score) of the position, or None if not in the book."""
+        key, mirrored = board.get_canonical_key()
+        low, high = 0, self.__size
+        while low < high:
+            middle = (low + high) // 2
+            record_key, move, score = RECORD.unpack_from(self.__data, middle * RECORD.size)
+            if record_key == key:
+                return (mirror_column(move) if mirrored else move), score
+            if record_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self) -> None:
+        self.__data.close()
+
+
+# Script ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 Opening Book",
+        description="Build the opening book of an AI.",
+    )
+    parser.add_argument(
+        "--plies", type=int, default=4, help="The book covers the moves before this ply."
+    )
+    parser.add_argument("--depth", type=int, default=6, help="The search depth.")
+    parser.add_argument("--eval", type=str, default="eval_3", help="The eval function.")
+    parser.add_argument(
+        "--actions", type=str, default="board_actions_2", help="The actions function."
+    )
+    parser.add_argument("--output", type=str, default="book.bin", help="The book file.")
+    args = parser.parse_args()
+
+    nb_records = build_book(
+        args.output,
+        args.plies,
+        args.depth,
+        getattr(eval_tools, args.eval),
+        getattr(eval_tools, args.actions),
+    )
+    print(f"{nb_records} positions written in {args.output}")
@@ -0,0 +1,93 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Value
+from random import randint
+from math import inf
+from board import Board
+from alpha_beta import min_value, forced_actions
+from transposition import TranspositionTable
+
+# State of a worker process, set by init_worker
+worker_alpha = None
+worker_tt = None
+# The actions function of a worker which learns from the cut offs (HistoryActions),
+# kept between the searches of the worker
+worker_history = None
+
+
+def init_worker(alpha, tt_size) -> None:
+    """Stores the shared alpha bound and creates the table of the worker."""
+    global worker_alpha, worker_tt
+    worker_alpha = alpha
+    worker_tt = TranspositionTable(tt_size) if tt_size else None
+
+
+def search_root_action(
+    board: Board, symbol: str, action: int, depth: int, eval_fx, actions_fx, threats=False
+):
+    """
+    Returns (action, score) of one root action, searched in a worker.
+    The search starts with the best root score known so far as alpha, and
+    publishes its score for the next root actions.
+    """
+    global worker_history
+    if hasattr(actions_fx, "on_cutoff"):
+        # the pickled copy would forget the cut offs at the end of the search
+        if worker_history is None:
+            worker_history = actions_fx
+        actions_fx = worker_history
+    board.put_symbol(symbol, action)
+    alpha = worker_alpha.value
+    v, _ = min_value(
+        board, symbol, depth - 1, alpha, +inf, eval_fx, actions_fx, worker_tt, None, threats
+    )
+    with worker_alpha.get_lock():
+        if v > worker_alpha.value:
+            worker_alpha.value = v
+    return action, v
+
+
+class ParallelSearch:
+    """
+    Alpha-beta with the root actions split over a pool of processes.
+    The pool is kept between the searches, call close() to stop it.
+    """
+
+    def __init__(self, workers: int, tt_size=None) -> None:
+        self.__alpha = Value("d", -inf)
+        self.__pool = ProcessPoolExecutor(
+            workers, initializer=init_worker, initargs=(self.__alpha, tt_size)
+        )
+
+    def alphabeta(
+        self, board: Board, symbol: str, depth: int, eval_fx, actions_fx, threats=False
+    ) -> int:
+        """Returns the best column to play the next move."""
+        self.__alpha.value = -inf
+        actions = list(actions_fx(board))
+        if threats and depth >= 2:
+            actions = forced_actions(board, symbol, actions)
+        # the first action gives a bound to the others (young brothers wait)
+        first = self.__pool.submit(
+            search_root_action, board, symbol, actions[0], depth, eval_fx, actions_fx, threats
+        )
+        results = dict([first.result()])
+        futures = [
+            self.__pool.submit(
+                search_root_action, board, symbol, action, depth, eval_fx, actions_fx, threats
+            )
+            for action in actions[1:]
+        ]
+        results.update(future.result() for future in futures)
+        # same choice as max_value, in the order of actions_fx
+        v = -inf
+        best_action = None
+        for action in actions:
+            v_bis = results[action]
+            if v_bis > v or (v_bis == v and randint(0, 1) == 1):
+                v = v_bis
+                best_action = action
+        return best_action
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        self.__pool.shutdown()
@@ -1,7 +1,18 @@
+import re
 from random import choice
+from threading import Event, Thread
+from math import inf
 from minimax import minimax
-from alpha_beta import alphabeta
+from pvs import pvs
+from alpha_beta import alphabeta, iterative_deepening, max_value, SearchTimeout
 from eval_tools import *
+import eval_tools
+from board import mirror_column
+from transposition import TranspositionTable, canonical_key
+from parallel_search import ParallelSearch
+from opening_book import OpeningBook
+from solver import Solver
+from search_stats import SearchStats
 
 
 class Player:
@@ -10,6 +21,22 @@ class Player:
         Return the column number to play the player move.
         """
 
+    def end_game(self) -> None:
+        """
+        Called when the game is over (stops the work done during the opponent's turn).
+        """
+
+    def new_game(self) -> None:
+        """
+        Forgets what the previous games left (transposition table...), so a
+        seeded game (see game_store.seed_game) is always played the same way.
+        """
+
+    def close(self) -> None:
+        """
+        Release the resources of the player (processes...).
+        """
+
 
 class HumanPlayer(Player):
     def __str__(self) -> str:
@@ -42,38 +69,369 @@ class RandomPlayer(Player):
 
 
 class EvalPlayer(Player):
-    def __init__(self, name: str, eval_func, actions_fx, depth: int, use_minimax=False) -> None:
+    def __init__(
+        self,
+        name: str,
+        eval_func,
+        actions_fx,
+        depth: int,
+        use_minimax=False,
+        tt_size=None,
+        move_time_ms=None,
+        workers=None,
+        book=None,
+        threats=False,
+        search_stats=False,
+        ponder=False,
+        use_pvs=False,
+    ) -> None:
+        """
+        With move_time_ms, alpha-beta is run with iterative deepening until the
+        time budget of the move is over, and depth is the maximum depth.
+        With workers, the root actions of alpha-beta are searched in a pool of
+        processes (each one with its own transposition table).
+        With book, the path of an opening book, the positions of the book are
+        not searched.
+        With threats, alpha-beta plays the immediate wins and the forced blocks
+        without searching the other actions.
+        With search_stats, the counters of the last search are kept in
+        last_search_stats (not with the workers).
+        With ponder, the replies of the opponent are searched in a background
+        thread during the opponent's turn, to fill the transposition table
+        (created if tt_size is not given) and to answer at once to a reply
+        already searched. The background search stops when the player plays
+        again, on end_game() and on close().
+        With use_pvs, the principal variation search of pvs.py is used instead
+        of alpha-beta (fixed depth only).
+        """
+        assert not (use_minimax and move_time_ms), "Time budget needs alpha-beta!"
+        assert not (use_minimax and workers), "Workers need alpha-beta!"
+        assert not (move_time_ms and workers), "Time budget is not parallel!"
+        assert not (ponder and (use_minimax or workers)), "Pondering needs alpha-beta!"
+        assert not (
+            use_pvs and (use_minimax or move_time_ms or workers or ponder)
+        ), "PVS is only with a fixed depth!"
         self.__name = name
         self.__eval_func = eval_func
+        # the killer moves and the history of a player are its own
+        if isinstance(actions_fx, HistoryActions):
+            actions_fx = HistoryActions()
         self.__actions_fx = actions_fx
         self.__depth = depth
         self.__use_minimax = use_minimax
+        self.__move_time_ms = move_time_ms
+        self.__threats = threats
+        self.__use_pvs = use_pvs
+        # The transposition table is kept between the turns (alpha-beta only),
+        # with workers each process has its own (see ParallelSearch)
+        use_tt = tt_size and not use_minimax and not workers
+        self.__tt = TranspositionTable(tt_size) if use_tt else None
+        if ponder and self.__tt is None:
+            self.__tt = TranspositionTable()
+        # The pool is created on the first move and kept between the turns
+        self.__workers = workers
+        self.__tt_size = tt_size
+        self.__parallel = None
+        self.__book = OpeningBook(book) if book else None
+        self.__search_stats = search_stats
+        self.__last_search_stats = None
+        # The background search of the replies, and the moves it found by position
+        self.__ponder = ponder
+        self.__ponder_thread = None
+        self.__ponder_stop = None
+        self.__ponder_moves = {}
 
     def __str__(self) -> str:
-        algo = "AB" if not self.__use_minimax else "MM"
+        algo = "MM" if self.__use_minimax else "PVS" if self.__use_pvs else "AB"
+        if self.__move_time_ms:
+            return f"{self.__name} (depth: {self.__depth} | {algo} | {self.__move_time_ms}ms)"
         return f"{self.__name} (depth: {self.__depth} | {algo})"
 
+    @property
+    def transposition_table(self):
+        """The transposition table of the player, None if disabled or with workers."""
+        return self.__tt
+
+    @property
+    def workers(self):
+        """The number of processes of the search, None without workers."""
+        return self.__workers
+
+    @property
+    def last_search_stats(self):
+        """The SearchStats of the last move, None if disabled or not searched."""
+        return self.__last_search_stats
+
+    def score(self, symbol: str, board: Board) -> float:
+        """
+        Returns the alpha-beta score of the board for symbol at the depth of the
+        player, with its eval, actions and transposition table.
+        """
+        score, _ = max_value(
+            board,
+            symbol,
+            self.__depth,
+            -inf,
+            +inf,
+            self.__eval_func,
+            self.__actions_fx,
+            self.__tt,
+            list(self.__actions_fx(board)),
+        )
+        return score
+
     def play(self, symbol: str, board: Board) -> int:
+        self.__last_search_stats = None
+        self.stop_pondering()
+        # the book first, the pondered moves are only searched
+        move = None
+        if self.__book is not None:
+            entry = self.__book.lookup(board)
+            if entry is not None:
+                move = entry[0]
+        if move is None and self.__ponder:
+            key, mirrored = canonical_key(board, symbol)
+            move = self.__ponder_moves.get(key)
+            if move is not None and mirrored:
+                move = mirror_column(move)
+        if move is None:
+            move = self.__search(symbol, board)
+        if self.__ponder:
+            self.__start_pondering(symbol, board, move)
+        return move
+
+    def __start_pondering(self, symbol: str, board: Board, move: int) -> None:
+        """Starts to search the replies to the move in a background thread."""
+        self.__ponder_moves = {}
+        board = board.copy()
+        board.put_symbol(symbol, move)
+        if board.is_winner(symbol) or board.is_full():
+            return
+        self.__ponder_stop = Event()
+        self.__ponder_thread = Thread(
+            target=self.__ponder_replies,
+            args=(symbol, board, self.__ponder_stop.is_set),
+            daemon=True,
+        )
+        self.__ponder_thread.start()
+
+    def __ponder_replies(self, symbol: str, board: Board, stop) -> None:
+        """
+        Searches the position after each reply of the opponent, at depth 1, 2...
+        until the depth of the player or until stop() returns True.
+        """
+        opponent = get_opponent(symbol)
+        # the replies giving mirror positions are searched once
+        replies = []
+        keys = set()
+        for reply in self.__actions_fx(board):
+            board.put_symbol(opponent, reply)
+            key, _ = canonical_key(board, symbol)
+            board.undo()
+            if key not in keys:
+                keys.add(key)
+                replies.append(reply)
+        try:
+            for depth in range(1, self.__depth + 1):
+                for reply in replies:
+                    board.put_symbol(opponent, reply)
+                    if not board.is_winner(opponent) and not board.is_full():
+                        _, move = max_value(
+                            board,
+                            symbol,
+                            depth,
+                            -inf,
+                            +inf,
+                            self.__eval_func,
+                            self.__actions_fx,
+                            self.__tt,
+                            list(self.__actions_fx(board)),
+                            stop,
+                            self.__threats,
+                        )
+                        if depth == self.__depth:
+                            key, mirrored = canonical_key(board, symbol)
+                            self.__ponder_moves[key] = mirror_column(move) if mirrored else move
+                    board.undo()
+        except SearchTimeout:
+            # the opponent has played, the board is a copy
+            pass
+
+    def stop_pondering(self) -> None:
+        """Stops the background search, if any, and waits for its end."""
+        if self.__ponder_thread is not None:
+            self.__ponder_stop.set()
+            self.__ponder_thread.join()
+            self.__ponder_thread = None
+
+    def __search(self, symbol: str, board: Board) -> int:
+        if self.__workers:
+            if self.__parallel is None:
+                self.__parallel = ParallelSearch(self.__workers, self.__tt_size)
+            return self.__parallel.alphabeta(
+                board, symbol, self.__depth, self.__eval_func, self.__actions_fx, self.__threats
+            )
+        stats = SearchStats() if self.__search_stats else None
+        self.__last_search_stats = stats
         if self.__use_minimax:
-            algo = minimax
-        else:
-            algo = alphabeta
-        return algo(board, symbol, self.__depth, self.__eval_func, self.__actions_fx)
+            return minimax(
+                board, symbol, self.__depth, self.__eval_func, self.__actions_fx, stats
+            )
+        if self.__move_time_ms:
+            return iterative_deepening(
+                board,
+                symbol,
+                self.__depth,
+                self.__eval_func,
+                self.__actions_fx,
+                self.__move_time_ms,
+                self.__tt,
+                self.__threats,
+                stats,
+            )
+        if self.__use_pvs:
+            return pvs(
+                board,
+                symbol,
+                self.__depth,
+                self.__eval_func,
+                self.__actions_fx,
+                self.__tt,
+                self.__threats,
+                stats,
+            )
+        return alphabeta(
+            board,
+            symbol,
+            self.__depth,
+            self.__eval_func,
+            self.__actions_fx,
+            self.__tt,
+            self.__threats,
+            stats,
+        )
+
+    def end_game(self) -> None:
+        self.stop_pondering()
+        self.__ponder_moves = {}
+
+    def new_game(self) -> None:
+        self.end_game()
+        if self.__tt is not None:
+            self.__tt.clear()
+        # the actions functions which learn from the cut offs (HistoryActions)
+        clear = getattr(self.__actions_fx, "clear", None)
+        if clear is not None:
+            clear()
+
+    def close(self) -> None:
+        self.end_game()
+        if self.__parallel is not None:
+            self.__parallel.close()
+            self.__parallel = None
+        if self.__book is not None:
+            self.__book.close()
+            self.__book = None
 
 
 class EasyPlayer(EvalPlayer):
-    def __init__(self) -> None:
-        super().__init__("Easy", eval_3, board_actions_2, 2)
+    def __init__(self, **kwargs) -> None:
+        super().__init__("Easy", eval_3, board_actions_2, 2, **kwargs)
 
 
 class MediumPlayer(EvalPlayer):
-    def __init__(self) -> None:
-        super().__init__("Medium", eval_3, board_actions_2, 4)
+    def __init__(self, **kwargs) -> None:
+        super().__init__("Medium", eval_3, board_actions_2, 4, **kwargs)
 
 
 class HardPlayer(EvalPlayer):
-    def __init__(self) -> None:
-        super().__init__("Hard", eval_3, board_actions_2, 6)
+    def __init__(self, **kwargs) -> None:
+        super().__init__("Hard", eval_3, board_actions_2, 6, **kwargs)
+
+
+class SolverPlayer(Player):
+    def __init__(self, fallback: Player = None, from_move: int = 0, tt_size=1 << 22) -> None:
+        """
+        Perfect player. The first moves are very long to solve, so the fallback
+        player, if any, plays the moves before from_move.
+        """
+        self.__solver = Solver(tt_size)
+        self.__fallback = fallback
+        self.__from_move = from_move
+
+    def __str__(self) -> str:
+        return "Solver Player"
+
+    def play(self, symbol: str, board: Board) -> int:
+        if self.__fallback is not None and len(board.history) < self.__from_move:
+            return self.__fallback.play(symbol, board)
+        return self.__solver.best_move(board)
+
+    def end_game(self) -> None:
+        if self.__fallback is not None:
+            self.__fallback.end_game()
+
+    def new_game(self) -> None:
+        if self.__fallback is not None:
+            self.__fallback.new_game()
+
+    def close(self) -> None:
+        if self.__fallback is not None:
+            self.__fallback.close()
+
+
+def get_player(name: str, **kwargs) -> Player:
+    """
+    Returns the player described by its name: "easy", "medium", "hard",
+    "solver" (hard for the first 14 moves) or
+    "eval_X:board_actions_X:depth" with the options ":m", ":p", ":t200", ":w4" or ":f".
+    The keyword arguments are given to EvalPlayer (tt_size, book...).
+    """
+    pattern = r"^(?P<eval>\w+):(?P<action>\w+):(?P<depth>\d+)(?P<options>(:\w+)*)$"
+    matcher = re.search(pattern, name)
+    if matcher:
+        res = matcher.groupdict()
+        eval_fx = getattr(eval_tools, res["eval"])
+        action_fx = getattr(eval_tools, res["action"])
+        depth = int(res["depth"])
+        use_minimax = False
+        move_time_ms = None
+        workers = None
+        threats = False
+        use_pvs = False
+        # options: "m" for minimax, "p" for PVS, "t200" for 200ms per move,
+        # "w4" for 4 workers, "f" for the forced moves
+        for option in res["options"].split(":")[1:]:
+            if option == "m":
+                use_minimax = True
+            elif option == "p":
+                use_pvs = True
+            elif option == "f":
+                threats = True
+            elif re.fullmatch(r"t\d+", option):
+                move_time_ms = int(option[1:])
+            elif re.fullmatch(r"w\d+", option):
+                workers = int(option[1:])
+            else:
+                raise ValueError(f"Unknown player option: {option}")
+        name = "{}:{}".format(res["eval"], res["action"])
+        return EvalPlayer(
+            name,
+            eval_fx,
+            action_fx,
+            depth,
+            use_minimax,
+            move_time_ms=move_time_ms,
+            workers=workers,
+            threats=threats,
+            use_pvs=use_pvs,
+            **kwargs,
+        )
+    elif name == "solver":
+        return SolverPlayer(HardPlayer(**kwargs), 14)
+    else:
+        player_map = {"easy": EasyPlayer, "medium": MediumPlayer, "hard": HardPlayer}
+        return player_map[name](**kwargs)
 
 
 # Unused --------------------
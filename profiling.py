@@ -0,0 +1,60 @@
+# Profiling of the games: each process keeps its own cProfile profile, saved in
+# PATH.<pid>, and the files are merged in PATH at the end.
+#
+# Open the merged profile with: snakeviz PATH
+
+import cProfile
+import glob
+import os
+import pstats
+
+# The number of functions printed after the merge
+PROFILE_TOP = 20
+
+# The profile of the current process, created on the first profiled call
+process_profile = None
+
+
+def get_process_paths(path: str):
+    """Returns the profile files of the processes for this path."""
+    paths = glob.glob(glob.escape(path) + ".*")
+    return sorted(p for p in paths if p.rsplit(".", 1)[1].isdigit())
+
+
+def clear_profiles(path: str) -> None:
+    """Removes the profile files of the processes of a previous run."""
+    for process_path in get_process_paths(path):
+        os.remove(process_path)
+
+
+def profiled(path, fx, *args):
+    """
+    Returns fx(*args). If path is not None, the call is added to the profile of
+    this process, which is saved in path.<pid>.
+    """
+    if path is None:
+        return fx(*args)
+    global process_profile
+    if process_profile is None:
+        process_profile = cProfile.Profile()
+    process_profile.enable()
+    try:
+        return fx(*args)
+    finally:
+        process_profile.disable()
+        process_profile.dump_stats(f"{path}.{os.getpid()}")
+
+
+def merge_profiles(path: str, top: int = PROFILE_TOP) -> None:
+    """
+    Merges the profiles of the processes in path and prints the top functions
+    by cumulative time.
+    """
+    process_paths = get_process_paths(path)
+    if not process_paths:
+        print("No profile to merge")
+        return
+    stats = pstats.Stats(*process_paths)
+    stats.dump_stats(path)
+    print(f"Profile of {len(process_paths)} processes written in {path}")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
@@ -0,0 +1,264 @@
+# Principal variation search: alpha-beta where only the first action of a node
+# is searched with the full window. The other actions are searched with a null
+# window (alpha, alpha) which only tells if they are better, and are searched
+# again with the full window when they are. The late actions are first searched
+# with a reduced depth (late move reductions).
+#
+# Same scores and window as alpha_beta.py: a score equal to a bound is exact,
+# so (alpha, alpha) is a valid null window for int and float evals.
+
+from typing import Tuple
+from random import randint
+from math import inf
+from board import Board
+from eval_tools import terminal_test, get_opponent
+from transposition import TranspositionTable, canonical_key
+from alpha_beta import tt_lookup, tt_save, cutoff, forced_actions, first_action
+from search_stats import SearchStats
+
+# The actions searched at full depth in a node, the next ones are reduced
+LMR_FULL_ACTIONS = 3
+# The minimum depth of a node to reduce its late actions
+LMR_MIN_DEPTH = 3
+# The number of plies removed by a reduction
+LMR_REDUCTION = 1
+
+
+def pvs(
+    board: Board,
+    symbol: str,
+    depth: int,
+    eval_fx,
+    actions_fx,
+    tt: TranspositionTable = None,
+    threats: bool = False,
+    stats: SearchStats = None,
+) -> int:
+    """
+    Returns the best column to play the next move.
+    The options are the ones of alpha_beta.alphabeta.
+    """
+    if stats is not None:
+        eval_fx, actions_fx = stats.wrap(board, eval_fx, actions_fx)
+    _, best_action = max_value(
+        board,
+        symbol,
+        depth,
+        -inf,
+        +inf,
+        eval_fx,
+        actions_fx,
+        tt,
+        list(actions_fx(board)),
+        threats,
+        stats,
+    )
+    return best_action
+
+
+def get_reduction(depth: int, index: int) -> int:
+    """Returns the number of plies removed from the search of the index-th action."""
+    if depth >= LMR_MIN_DEPTH and index >= LMR_FULL_ACTIONS:
+        return LMR_REDUCTION
+    return 0
+
+
+def max_value(
+    board: Board,
+    symbol: str,
+    depth: int,
+    alpha: float,
+    beta: float,
+    eval_fx,
+    actions_fx,
+    tt=None,
+    actions=None,
+    threats=False,
+    stats=None,
+) -> Tuple[float, int]:
+    """
+    If actions is given, these actions are searched in this order (used at the root)
+    and the transposition table is only updated.
+    """
+    if stats is not None:
+        stats.nodes += 1
+    # check the terminal test
+    if terminal_test(board, depth):
+        return eval_fx(board, symbol, depth), 0
+    # check the transposition table
+    tt_action = None
+    if tt is not None:
+        key, mirrored = canonical_key(board, symbol)
+        if actions is None:
+            score, tt_action = tt_lookup(tt, key, depth, alpha, beta, mirrored)
+            if score is not None:
+                return score, tt_action
+        alpha_orig, beta_orig = alpha, beta
+    if actions is None:
+        actions = first_action(actions_fx(board), tt_action)
+    if threats and depth >= 2:
+        actions = forced_actions(board, symbol, actions)
+    # init
+    v = -inf
+    best_action = None
+    for i, action in enumerate(actions):
+        board.put_symbol(symbol, action)
+        if i == 0:
+            # the principal variation
+            v_bis, _ = min_value(
+                board, symbol, depth - 1, alpha, beta, eval_fx, actions_fx, tt, threats, stats
+            )
+        else:
+            reduction = get_reduction(depth, i)
+            v_bis, _ = min_value(
+                board,
+                symbol,
+                depth - 1 - reduction,
+                alpha,
+                alpha,
+                eval_fx,
+                actions_fx,
+                tt,
+                threats,
+                stats,
+            )
+            if v_bis > alpha and reduction:
+                # not so bad, search it at full depth
+                v_bis, _ = min_value(
+                    board, symbol, depth - 1, alpha, alpha, eval_fx, actions_fx, tt, threats, stats
+                )
+            if alpha < v_bis <= beta:
+                # better than the principal variation, get its exact score
+                v_bis, _ = min_value(
+                    board, symbol, depth - 1, alpha, beta, eval_fx, actions_fx, tt, threats, stats
+                )
+        board.undo()
+        # update the best move if the utility is better
+        if v_bis > v or (v_bis == v and randint(0, 1) == 1):
+            v = v_bis
+            best_action = action
+        # alpha beta cut off
+        if v > beta:
+            cutoff(board, actions_fx, best_action, depth)
+            if stats is not None:
+                stats.add_cutoff(i == 0)
+            break
+        alpha = max(alpha, v)
+    # save the result
+    if tt is not None:
+        tt_save(tt, key, depth, alpha_orig, beta_orig, v, best_action, mirrored)
+    return v, best_action
+
+
+def min_value(
+    board: Board,
+    symbol: str,
+    depth: int,
+    alpha: float,
+    beta: float,
+    eval_fx,
+    actions_fx,
+    tt=None,
+    threats=False,
+    stats=None,
+) -> Tuple[float, int]:
+    # "symbol" is still the maximizing player, see alpha_beta.min_value
+    opponent = get_opponent(symbol)
+
+    if stats is not None:
+        stats.nodes += 1
+    # check the terminal test
+    if terminal_test(board, depth):
+        return -eval_fx(board, opponent, depth), 0
+    # check the transposition table
+    tt_action = None
+    if tt is not None:
+        key, mirrored = canonical_key(board, symbol)
+        score, tt_action = tt_lookup(tt, key, depth, alpha, beta, mirrored)
+        if score is not None:
+            return score, tt_action
+        alpha_orig, beta_orig = alpha, beta
+    actions = first_action(actions_fx(board), tt_action)
+    if threats and depth >= 2:
+        actions = forced_actions(board, opponent, actions)
+    # init
+    v = +inf
+    best_action = None
+    for i, action in enumerate(actions):
+        board.put_symbol(opponent, action)
+        if i == 0:
+            # the principal variation
+            v_bis, _ = max_value(
+                board,
+                symbol,
+                depth - 1,
+                alpha,
+                beta,
+                eval_fx,
+                actions_fx,
+                tt,
+                None,
+                threats,
+                stats,
+            )
+        else:
+            reduction = get_reduction(depth, i)
+            v_bis, _ = max_value(
+                board,
+                symbol,
+                depth - 1 - reduction,
+                beta,
+                beta,
+                eval_fx,
+                actions_fx,
+                tt,
+                None,
+                threats,
+                stats,
+            )
+            if v_bis < beta and reduction:
+                # not so bad, search it at full depth
+                v_bis, _ = max_value(
+                    board,
+                    symbol,
+                    depth - 1,
+                    beta,
+                    beta,
+                    eval_fx,
+                    actions_fx,
+                    tt,
+                    None,
+                    threats,
+                    stats,
+                )
+            if alpha <= v_bis < beta:
+                # better than the principal variation, get its exact score
+                v_bis, _ = max_value(
+                    board,
+                    symbol,
+                    depth - 1,
+                    alpha,
+                    beta,
+                    eval_fx,
+                    actions_fx,
+                    tt,
+                    None,
+                    threats,
+                    stats,
+                )
+        board.undo()
+        # update the best move if the utility is better
+        if v_bis < v:
+            v = v_bis
+            best_action = action
+        # alpha beta cut off
+        if v < alpha:
+            cutoff(board, actions_fx, best_action, depth)
+            if stats is not None:
+                stats.add_cutoff(i == 0)
+            break
+        beta = min(beta, v)
+    # save the result
+    if tt is not None:
+        tt_save(tt, key, depth, alpha_orig, beta_orig, v, best_action, mirrored)
+    return v, best_action
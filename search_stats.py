@@ -0,0 +1,98 @@
+from time import perf_counter
+from board import Board
+
+
+class SearchStats:
+    """
+    Counters of a search: nodes, leaves, cut offs, deepest leaf and the time
+    spent in the eval and actions functions.
+    The searches only update it when it is given, so there is no cost otherwise.
+    """
+
+    def __init__(self) -> None:
+        self.nb_searches = 0
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.max_depth = 0
+        self.eval_time = 0.0
+        self.actions_time = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"nodes: {self.nodes} | leaves: {self.leaves} | cut offs: {self.cutoffs}"
+            f" ({self.first_cutoff_rate:.0%} on first move) | ebf: {self.ebf:.2f}"
+            f" | depth: {self.max_depth} | eval: {self.eval_time:.3f}s"
+            f" | actions: {self.actions_time:.3f}s"
+        )
+
+    @property
+    def ebf(self) -> float:
+        """The effective branching factor: nodes ** (1 / depth)."""
+        if self.max_depth == 0:
+            return 0.0
+        return (self.nodes / self.nb_searches) ** (1 / self.max_depth)
+
+    @property
+    def first_cutoff_rate(self) -> float:
+        """The part of the cut offs made by the first action of the node."""
+        return self.first_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def add_cutoff(self, first: bool) -> None:
+        self.cutoffs += 1
+        if first:
+            self.first_cutoffs += 1
+
+    def add(self, other: "SearchStats") -> None:
+        """Adds the counters of another search (the depth is the deepest one)."""
+        self.nb_searches += other.nb_searches
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.cutoffs += other.cutoffs
+        self.first_cutoffs += other.first_cutoffs
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.eval_time += other.eval_time
+        self.actions_time += other.actions_time
+
+    def to_dict(self) -> dict:
+        """Returns the counters, to save them in JSON."""
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, counters: dict) -> "SearchStats":
+        """Returns the stats of the counters of to_dict."""
+        stats = cls()
+        vars(stats).update(counters)
+        return stats
+
+    def wrap(self, board: Board, eval_fx, actions_fx):
+        """
+        Starts a search from this board. Returns (eval_fx, actions_fx) wrapped
+        to count the leaves, the depth and the time spent in them.
+        The actions are returned as a list (to index the first one).
+        """
+        self.nb_searches += 1
+        root_ply = len(board.history)
+
+        def timed_eval(board: Board, symbol: str, depth: int):
+            before = perf_counter()
+            score = eval_fx(board, symbol, depth)
+            self.eval_time += perf_counter() - before
+            self.leaves += 1
+            ply = len(board.history) - root_ply
+            if ply > self.max_depth:
+                self.max_depth = ply
+            return score
+
+        def timed_actions(board: Board):
+            before = perf_counter()
+            actions = list(actions_fx(board))
+            self.actions_time += perf_counter() - before
+            return actions
+
+        # keep the hook of the actions functions which learn from the cut offs
+        on_cutoff = getattr(actions_fx, "on_cutoff", None)
+        if on_cutoff is not None:
+            timed_actions.on_cutoff = on_cutoff
+        return timed_eval, timed_actions
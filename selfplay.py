@@ -0,0 +1,255 @@
+# Self-play data: play games between AI in a pool of processes and save every
+# position with its search score and the result of the game, to fit evals.
+#
+# python3 selfplay.py --players eval_3:board_actions_2:4 --nb-games 1000 --output data
+#
+# The rows are appended to three .npy files (grown by chunks, never loaded):
+# - data_positions.npy: int8 (n, NB_ROWS, NB_COLUMNS), the cells with the codes
+#   NP_EMPTY, NP_RED and NP_YELLOW (row 0 is the top row),
+# - data_scores.npy: float64 (n,), the search score for the player to move,
+# - data_results.npy: int8 (n,), the result for the player to move (1 win,
+#   0 draw, -1 loss).
+
+import argparse
+import os
+import random
+import struct
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from board import Board
+from player import EvalPlayer, get_player
+from eval_tools import board_actions_1, board_array, get_opponent
+
+# The size of the .npy headers, large enough for any shape of this module
+NPY_HEADER_SIZE = 128
+# The number of rows added when an array is full
+CHUNK_ROWS = 1 << 16
+# The transposition table of a player in a worker
+TT_SIZE = 1 << 18
+# The games in flight per process: the rows of the finished games are in memory
+# until they are appended
+GAMES_IN_FLIGHT = 4
+
+# The players of a worker process, built once by spec
+worker_players = {}
+
+
+# Arrays ------------------------------------------------------------------------
+
+
+def write_npy_header(f, dtype: np.dtype, shape) -> None:
+    """Writes a .npy (version 1.0) header padded to NPY_HEADER_SIZE bytes."""
+    header = repr(
+        {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": tuple(shape),
+        }
+    )
+    prefix = np.lib.format.magic(1, 0)
+    header_size = NPY_HEADER_SIZE - len(prefix) - 2
+    header = header.ljust(header_size - 1) + "\n"
+    assert len(header) == header_size, "The .npy header is too long!"
+    f.seek(0)
+    f.write(prefix + struct.pack("<H", header_size) + header.encode("latin1"))
+
+
+class GrowingArray:
+    """
+    A .npy file opened with a memmap, with room for more rows than it has.
+    The file grows by CHUNK_ROWS rows when it is full, and gets its real size
+    back on close(). An existing file of this module is appended to.
+    """
+
+    def __init__(self, path: str, dtype, row_shape=()) -> None:
+        self.__path = path
+        self.__dtype = np.dtype(dtype)
+        self.__row_shape = tuple(row_shape)
+        self.__row_size = self.__dtype.itemsize * int(np.prod(self.__row_shape))
+        self.size = 0
+        if os.path.exists(path):
+            existing = np.load(path, mmap_mode="r")
+            assert existing.offset == NPY_HEADER_SIZE, f"{path} is not a growing array!"
+            assert existing.dtype == self.__dtype and existing.shape[1:] == self.__row_shape
+            self.size = existing.shape[0]
+            del existing
+        self.__file = open(path, mode="r+b" if self.size else "w+b")
+        self.__capacity = 0
+        self.__data = None
+        self.__resize(self.size + CHUNK_ROWS)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __resize(self, capacity: int) -> None:
+        """Sets the number of rows of the file and maps it again."""
+        if self.__data is not None:
+            self.__data.flush()
+            self.__data = None
+        self.__file.truncate(NPY_HEADER_SIZE + capacity * self.__row_size)
+        write_npy_header(self.__file, self.__dtype, (capacity,) + self.__row_shape)
+        self.__file.flush()
+        self.__capacity = capacity
+        if capacity > 0:
+            self.__data = np.memmap(
+                self.__file,
+                self.__dtype,
+                mode="r+",
+                offset=NPY_HEADER_SIZE,
+                shape=(capacity,) + self.__row_shape,
+            )
+
+    def append(self, rows: np.ndarray) -> None:
+        """Adds the rows at the end of the array."""
+        end = self.size + len(rows)
+        if end > self.__capacity:
+            # grow by whole chunks
+            self.__resize(end + CHUNK_ROWS - end % CHUNK_ROWS)
+        self.__data[self.size : end] = rows
+        self.size = end
+
+    def close(self) -> None:
+        """Cuts the free rows and closes the file."""
+        self.__resize(self.size)
+        self.__file.close()
+
+
+# Games -------------------------------------------------------------------------
+
+
+def get_worker_player(spec: str) -> EvalPlayer:
+    """
+    Returns the player of a spec (see player.get_player) in the current process.
+    The players and their tables are kept between the games.
+    """
+    if spec not in worker_players:
+        worker_players[spec] = get_player(spec, tt_size=TT_SIZE)
+    return worker_players[spec]
+
+
+def player_spec(spec: str) -> str:
+    """
+    Checks a --players spec: it must give an EvalPlayer (see get_player), with
+    no workers since the games are already played in a pool of processes.
+    """
+    try:
+        player = get_player(spec)
+    except (AttributeError, KeyError, ValueError):
+        raise argparse.ArgumentTypeError(f"unknown player: {spec}")
+    player.close()
+    if not isinstance(player, EvalPlayer):
+        raise argparse.ArgumentTypeError(f"{spec} has no search score")
+    if player.workers:
+        raise argparse.ArgumentTypeError(f"{spec}: the workers (:w) are not supported")
+    return spec
+
+
+def play_selfplay_game(red_spec: str, yellow_spec: str, seed: int, random_plies: int):
+    """
+    Plays one game and returns the (positions, scores, results) arrays of all
+    its positions. The first random_plies moves are random, so the games of
+    the same players differ; their positions are scored all the same.
+    """
+    random.seed(seed)
+    players = {
+        Board.RED: get_worker_player(red_spec),
+        Board.YELLOW: get_worker_player(yellow_spec),
+    }
+    board = Board()
+    symbol = Board.RED
+    positions = []
+    scores = []
+    symbols = []
+    while not board.is_full():
+        player = players[symbol]
+        # the score first: with a table, the move is then found from its entries
+        scores.append(player.score(symbol, board))
+        positions.append(board_array(board))
+        symbols.append(symbol)
+        if len(board.history) < random_plies:
+            move = random.choice(list(board_actions_1(board)))
+        else:
+            move = player.play(symbol, board)
+        board.put_symbol(symbol, move)
+        if board.is_winner(symbol):
+            break
+        symbol = get_opponent(symbol)
+    winner = symbol if board.is_winner(symbol) else None
+    results = [0 if winner is None else 1 if s == winner else -1 for s in symbols]
+    return (
+        np.array(positions, dtype=np.int8).reshape(-1, Board.NB_ROWS, Board.NB_COLUMNS),
+        np.array(scores, dtype=np.float64),
+        np.array(results, dtype=np.int8),
+    )
+
+
+def run_selfplay(
+    players, nb_games: int, output: str, workers=None, random_plies: int = 4, seed: int = 0
+) -> int:
+    """
+    Plays nb_games games for each (red, yellow) pair of players (a player also
+    plays against itself) and appends their positions to the output_*.npy
+    arrays. Returns the number of rows of the arrays.
+    """
+    arrays = (
+        GrowingArray(f"{output}_positions.npy", np.int8, (Board.NB_ROWS, Board.NB_COLUMNS)),
+        GrowingArray(f"{output}_scores.npy", np.float64),
+        GrowingArray(f"{output}_results.npy", np.int8),
+    )
+    games = [(red, yellow) for red in players for yellow in players] * nb_games
+    with ProcessPoolExecutor(workers) as pool:
+        max_in_flight = GAMES_IN_FLIGHT * (workers or os.cpu_count() or 1)
+        next_game = 0
+        nb_done = 0
+        futures = set()
+        while nb_done < len(games):
+            # only a few games are submitted at once, their rows are appended
+            # and dropped as soon as they are done
+            while next_game < len(games) and len(futures) < max_in_flight:
+                red, yellow = games[next_game]
+                futures.add(
+                    pool.submit(play_selfplay_game, red, yellow, seed + next_game, random_plies)
+                )
+                next_game += 1
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                for array, rows in zip(arrays, future.result()):
+                    array.append(rows)
+                nb_done += 1
+                print(f"{nb_done}/{len(games)} | {len(arrays[0])} positions")
+    for array in arrays:
+        array.close()
+    return len(arrays[0])
+
+
+# Script ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 Self-play",
+        description="Save the positions of games between AI with their scores and results.",
+    )
+    parser.add_argument(
+        "--players",
+        nargs="+",
+        type=player_spec,
+        default=["eval_3:board_actions_2:4"],
+        help="The players, as eval_X:board_actions_X:depth[:options] (see get_player).",
+    )
+    parser.add_argument(
+        "--nb-games", type=int, default=100, help="The number of games per pair of players."
+    )
+    parser.add_argument(
+        "--random-plies", type=int, default=4, help="The number of random first moves."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the first game.")
+    parser.add_argument("--workers", type=int, default=None, help="The number of processes.")
+    parser.add_argument(
+        "--output", type=str, default="selfplay", help="The prefix of the .npy files."
+    )
+    args = parser.parse_args()
+
+    nb_rows = run_selfplay(
+        args.players, args.nb_games, args.output, args.workers, args.random_plies, args.seed
+    )
+    print(f"{nb_rows} positions in {args.output}_*.npy")
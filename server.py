@@ -0,0 +1,386 @@
+# Game server: many games against the AI over TCP (or a Unix socket), with one
+# JSON object per line. The searches of the AI run in a pool of processes.
+#
+# python3 server.py --port 8765 --workers 4
+# python3 server.py --demo 100    (100 random players against a local server)
+#
+# Requests and answers (one request at a time per connection):
+#   {"op": "new", "ai": "medium", "ai_symbol": "Y"}    (ai: one of AIS)
+#       -> {"ok": true, "game": 1, "moves": [], "winner": null, "ended": false}
+#   {"op": "move", "game": 1, "column": 3}
+#       -> {"ok": true, "game": 1, "moves": [3, 2], "ai_move": 2, "winner": null, "ended": false}
+#   {"op": "state", "game": 1} -> same as "new"
+#   {"op": "close", "game": 1} -> {"ok": true}
+#   {"op": "metrics"} -> {"ok": true, "games": 1, "queue": 0, "in_flight": 0, ...}
+# An error is {"ok": false, "error": "..."}: "busy" when the search queue is
+# full, "timeout" when the AI did not answer in time (the move is cancelled).
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from board import Board
+from eval_tools import get_opponent
+from tournament import get_worker_player
+
+# Default configuration
+HOST = "127.0.0.1"
+PORT = 8765
+QUEUE_SIZE = 1024
+TIMEOUT = 30.0
+# The number of search latencies kept for the metrics
+LATENCY_SAMPLES = 1000
+# The AI the clients can play against: a timed out search is not stopped, so
+# the clients cannot ask for any spec (deep searches, workers...)
+AIS = ("easy", "medium", "hard")
+
+
+class ServerError(Exception):
+    """An error sent back to the client."""
+
+
+# Searches (in the workers) -----------------------------------------------------
+
+
+def search_move(spec: str, symbol: str, moves) -> int:
+    """Returns the move of the AI of this spec, the players are kept by the worker."""
+    return get_worker_player(spec, symbol).play(symbol, Board.from_moves(moves))
+
+
+# Server ------------------------------------------------------------------------
+
+
+class Session:
+    """A game between a client and the AI."""
+
+    def __init__(self, ai: str, ai_symbol: str) -> None:
+        self.ai = ai
+        self.ai_symbol = ai_symbol
+        self.board = Board()
+        # one request at a time on a game
+        self.lock = asyncio.Lock()
+
+    def get_winner(self):
+        for symbol in (Board.RED, Board.YELLOW):
+            if self.board.is_winner(symbol):
+                return symbol
+        return None
+
+    def has_ended(self) -> bool:
+        return self.get_winner() is not None or self.board.is_full()
+
+
+class GameServer:
+    """
+    The games of the clients. The searches wait in a bounded queue and are run
+    in a pool of processes by one dispatcher task per process.
+    """
+
+    def __init__(self, workers: int = 1, queue_size=QUEUE_SIZE, timeout=TIMEOUT) -> None:
+        self.__workers = workers
+        self.__timeout = timeout
+        # forked workers would keep the sockets of the clients open
+        self.__pool = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.__queue = asyncio.Queue(queue_size)
+        self.__dispatchers = []
+        self.__sessions = {}
+        self.__next_id = 1
+        self.__in_flight = 0
+        self.__nb_connections = 0
+        self.__latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.__counters = {"requests": 0, "searches": 0, "timeouts": 0, "rejected": 0}
+
+    async def start(self, host=HOST, port=PORT, path=None) -> asyncio.AbstractServer:
+        """Starts the dispatchers and listens on host:port, or on the Unix socket path."""
+        self.__dispatchers = [
+            asyncio.create_task(self.__dispatch()) for _ in range(self.__workers)
+        ]
+        if path is not None:
+            return await asyncio.start_unix_server(self.__handle_client, path)
+        return await asyncio.start_server(self.__handle_client, host, port)
+
+    def close(self) -> None:
+        """Stops the dispatchers and the worker processes."""
+        for dispatcher in self.__dispatchers:
+            dispatcher.cancel()
+        self.__pool.shutdown(cancel_futures=True)
+
+    # Searches
+
+    async def __dispatch(self) -> None:
+        """Runs the searches of the queue in the pool, one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            future, spec, symbol, moves, queued_at = await self.__queue.get()
+            # the request is already over (timeout)
+            if future.done():
+                continue
+            self.__in_flight += 1
+            try:
+                move = await loop.run_in_executor(
+                    self.__pool, search_move, spec, symbol, moves
+                )
+                if not future.done():
+                    future.set_result(move)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.__in_flight -= 1
+                self.__counters["searches"] += 1
+                self.__latencies.append(perf_counter() - queued_at)
+
+    async def __search(self, session: Session) -> int:
+        """Returns the move of the AI, searched in the pool."""
+        future = asyncio.get_running_loop().create_future()
+        job = (future, session.ai, session.ai_symbol, tuple(session.board.history), perf_counter())
+        try:
+            self.__queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.__counters["rejected"] += 1
+            raise ServerError("busy")
+        try:
+            return await asyncio.wait_for(future, self.__timeout)
+        except asyncio.TimeoutError:
+            self.__counters["timeouts"] += 1
+            raise ServerError("timeout")
+        except Exception as e:
+            # the search crashed in the worker
+            raise ServerError(f"search failed: {e!r}")
+
+    async def __play_ai(self, session: Session):
+        """Plays the move of the AI if it is its turn. Returns the move or None."""
+        if session.has_ended() or session.board.get_symbol_to_play() != session.ai_symbol:
+            return None
+        move = await self.__search(session)
+        session.board.put_symbol(session.ai_symbol, move)
+        return move
+
+    # Requests
+
+    def metrics(self) -> dict:
+        """Returns the size of the queue, the counters and the latencies (ms)."""
+        latencies = sorted(self.__latencies)
+        metrics = {
+            "connections": self.__nb_connections,
+            "games": len(self.__sessions),
+            "queue": self.__queue.qsize(),
+            "in_flight": self.__in_flight,
+            **self.__counters,
+        }
+        if latencies:
+            metrics["latency_ms"] = {
+                "mean": sum(latencies) / len(latencies) * 1000,
+                "p50": latencies[len(latencies) // 2] * 1000,
+                "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+                "max": latencies[-1] * 1000,
+            }
+        return metrics
+
+    def __get_game(self, request: dict, games: set) -> int:
+        """Returns the id of the game of the request, one of the games of the connection."""
+        game = request.get("game")
+        if not isinstance(game, int) or isinstance(game, bool):
+            raise ServerError(f"invalid game: {game!r}")
+        if game not in games:
+            raise ServerError(f"unknown game: {game}")
+        return game
+
+    def __state(self, game: int, session: Session) -> dict:
+        return {
+            "ok": True,
+            "game": game,
+            "moves": session.board.history,
+            "winner": session.get_winner(),
+            "ended": session.has_ended(),
+        }
+
+    async def __answer(self, request: dict, games: set) -> dict:
+        """Returns the answer of a request, games are the games of the connection."""
+        op = request.get("op")
+        if op == "new":
+            ai_symbol = request.get("ai_symbol", Board.YELLOW)
+            if ai_symbol not in (Board.RED, Board.YELLOW):
+                raise ServerError(f"unknown symbol: {ai_symbol}")
+            ai = request.get("ai", "medium")
+            if ai not in AIS:
+                raise ServerError(f"unknown ai: {ai!r}, one of {', '.join(AIS)}")
+            session = Session(ai, ai_symbol)
+            game = self.__next_id
+            self.__next_id += 1
+            self.__sessions[game] = session
+            games.add(game)
+            async with session.lock:
+                try:
+                    await self.__play_ai(session)
+                except ServerError:
+                    games.discard(game)
+                    del self.__sessions[game]
+                    raise
+                return self.__state(game, session)
+        if op == "move":
+            game = self.__get_game(request, games)
+            session = self.__sessions[game]
+            column = request.get("column")
+            async with session.lock:
+                board = session.board
+                if session.has_ended():
+                    raise ServerError("the game is over")
+                if session.board.get_symbol_to_play() == session.ai_symbol:
+                    raise ServerError("not your turn")
+                if not isinstance(column, int) or not 0 <= column < board.NB_COLUMNS:
+                    raise ServerError(f"invalid column: {column}")
+                if board.is_column_full(column):
+                    raise ServerError(f"the column is full: {column}")
+                board.put_symbol(get_opponent(session.ai_symbol), column)
+                try:
+                    ai_move = await self.__play_ai(session)
+                except ServerError:
+                    # the client can play the move again
+                    board.undo()
+                    raise
+                answer = self.__state(game, session)
+                answer["ai_move"] = ai_move
+                return answer
+        if op == "state":
+            game = self.__get_game(request, games)
+            return self.__state(game, self.__sessions[game])
+        if op == "close":
+            game = self.__get_game(request, games)
+            games.discard(game)
+            del self.__sessions[game]
+            return {"ok": True}
+        if op == "metrics":
+            return {"ok": True, **self.metrics()}
+        raise ServerError(f"unknown op: {op}")
+
+    async def __handle_client(self, reader, writer) -> None:
+        """Answers the requests of a connection, its games end with it."""
+        games = set()
+        self.__nb_connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.__counters["requests"] += 1
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ServerError("a request is a JSON object")
+                    answer = await self.__answer(request, games)
+                except json.JSONDecodeError:
+                    answer = {"ok": False, "error": "invalid JSON"}
+                except ServerError as e:
+                    answer = {"ok": False, "error": str(e)}
+                except Exception as e:
+                    # a bug must not end the connection and its games
+                    answer = {"ok": False, "error": f"internal error: {e!r}"}
+                writer.write(json.dumps(answer).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game in games:
+                del self.__sessions[game]
+            self.__nb_connections -= 1
+            writer.close()
+
+
+# Demo client -------------------------------------------------------------------
+
+
+async def request(reader, writer, message: dict) -> dict:
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def play_random_game(host: str, port: int, ai: str) -> dict:
+    """Plays a game with random moves against the AI, returns the last answer."""
+    reader, writer = await asyncio.open_connection(host, port)
+    answer = await request(
+        reader, writer, {"op": "new", "ai": ai, "ai_symbol": random.choice("RY")}
+    )
+    if not answer["ok"]:
+        writer.close()
+        await writer.wait_closed()
+        return answer
+    game = answer["game"]
+    while answer["ok"] and not answer["ended"]:
+        board = Board.from_moves(answer["moves"])
+        columns = [c for c in range(board.NB_COLUMNS) if not board.is_column_full(c)]
+        answer = await request(
+            reader, writer, {"op": "move", "game": game, "column": random.choice(columns)}
+        )
+    await request(reader, writer, {"op": "close", "game": game})
+    writer.close()
+    await writer.wait_closed()
+    return answer
+
+
+async def run_demo(nb_games: int, ai: str, workers: int, queue_size: int, timeout: float):
+    """Starts a server on a free port and plays nb_games games at the same time."""
+    server = GameServer(workers, queue_size, timeout)
+    tcp_server = await server.start(HOST, 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    before = perf_counter()
+    answers = await asyncio.gather(
+        *(play_random_game(HOST, port, ai) for _ in range(nb_games))
+    )
+    duration = perf_counter() - before
+    # let the server see the end of the connections
+    while server.metrics()["connections"] > 0:
+        await asyncio.sleep(0.01)
+    errors = [a["error"] for a in answers if not a["ok"]]
+    print(f"{nb_games} games in {duration:.1f}s, {len(errors)} errors {set(errors) or ''}")
+    print(json.dumps(server.metrics(), indent=2))
+    tcp_server.close()
+    await tcp_server.wait_closed()
+    server.close()
+
+
+# Script ------------------------------------------------------------------------
+
+
+async def serve(args) -> None:
+    server = GameServer(args.workers, args.queue_size, args.timeout)
+    tcp_server = await server.start(args.host, args.port, args.unix)
+    print(f"Listening on {args.unix or f'{args.host}:{args.port}'}")
+    try:
+        await tcp_server.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 Server",
+        description="Host games against the AI, with JSON lines over a socket.",
+    )
+    parser.add_argument("--host", type=str, default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", type=str, default=None, help="Listen on a Unix socket.")
+    parser.add_argument("--workers", type=int, default=1, help="The number of processes.")
+    parser.add_argument(
+        "--queue-size", type=int, default=QUEUE_SIZE, help="The searches waiting at most."
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=TIMEOUT, help="The seconds given to the AI."
+    )
+    parser.add_argument(
+        "--demo", type=int, default=None, help="Play this number of random games locally."
+    )
+    parser.add_argument("--ai", choices=AIS, default="easy", help="The AI of the demo.")
+    args = parser.parse_args()
+
+    if args.demo is not None:
+        asyncio.run(run_demo(args.demo, args.ai, args.workers, args.queue_size, args.timeout))
+    else:
+        asyncio.run(serve(args))
@@ -0,0 +1,196 @@
+# Perfect play solver: negamax with alpha-beta on the bitboards, null window
+# search, center-first move ordering and a transposition table.
+#
+# The score of a position is for the player to move:
+# - 0 for a draw,
+# - positive if he wins: 22 - the number of his tokens when he wins,
+# - negative if he loses: -(22 - the number of tokens of the opponent when he wins).
+
+from typing import Optional, Tuple
+from board import (
+    Board,
+    NB_COLUMNS,
+    COLUMN_MASKS,
+    winning_cells,
+    possible_moves,
+)
+from transposition import previous_prime
+
+NB_CELLS = Board.NB_COLUMNS * Board.NB_ROWS
+MIN_SCORE = -NB_CELLS // 2 + 3
+
+# The columns from the center to the sides
+COLUMN_ORDER = tuple(
+    NB_COLUMNS // 2 + (1 - 2 * (i % 2)) * (i + 1) // 2 for i in range(NB_COLUMNS)
+)
+
+
+# Bitboard utilities ------------------------------------------------------------
+
+
+def non_losing_moves(current: int, mask: int) -> int:
+    """
+    Returns the playable cells which do not give an immediate win to the
+    opponent, 0 if all the moves lose. The current player must not be able to
+    win in one move.
+    """
+    possible = possible_moves(mask)
+    opponent_win = winning_cells(current ^ mask, mask)
+    forced = possible & opponent_win
+    if forced:
+        # two threats: the game is lost
+        if forced & (forced - 1):
+            return 0
+        possible = forced
+    # do not play below a winning cell of the opponent
+    return possible & ~(opponent_win >> 1)
+
+
+def get_position(board: Board) -> Tuple[int, int, int]:
+    """
+    Returns (current, mask, moves): the tokens of the player to move, all the
+    tokens and the number of moves.
+    """
+    moves = len(board.history)
+    symbol = Board.RED if moves % 2 == 0 else Board.YELLOW
+    mask = board.get_mask(Board.RED) | board.get_mask(Board.YELLOW)
+    return board.get_mask(symbol), mask, moves
+
+
+# Solver ------------------------------------------------------------------------
+
+
+class Solver:
+    """
+    A solver keeps its transposition table (upper bounds of the scores)
+    between the positions.
+    """
+
+    def __init__(self, tt_size: int = 1 << 22) -> None:
+        self.__tt_size = previous_prime(tt_size)
+        self.__tt_keys = [0] * self.__tt_size
+        self.__tt_values = [0] * self.__tt_size
+        self.nb_nodes = 0
+
+    def negamax(self, current: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """
+        Returns the exact score if it is in (alpha, beta), else a bound:
+        an upper bound <= alpha or a lower bound >= beta.
+        The current player must not be able to win in one move.
+        """
+        self.nb_nodes += 1
+        moves_left = non_losing_moves(current, mask)
+        if moves_left == 0:
+            return -((NB_CELLS - moves) // 2)
+        if moves >= NB_CELLS - 2:
+            return 0
+        # the opponent cannot win with his next move
+        low = -((NB_CELLS - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        # we cannot win with our next move
+        high = (NB_CELLS - 1 - moves) // 2
+        key = current + mask
+        index = key % self.__tt_size
+        if self.__tt_keys[index] == key:
+            high = self.__tt_values[index] + MIN_SCORE - 1
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+        # the moves creating the most threats first, then from the center
+        children = []
+        for i, column in enumerate(COLUMN_ORDER):
+            move = moves_left & COLUMN_MASKS[column]
+            if move:
+                threats = winning_cells(current | move, mask).bit_count()
+                children.append((-threats, i, move))
+        children.sort()
+        opponent = current ^ mask
+        for _, _, move in children:
+            # the opponent becomes the current player
+            score = -self.negamax(opponent, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        self.__tt_keys[index] = key
+        self.__tt_values[index] = alpha - MIN_SCORE + 1
+        return alpha
+
+    def solve_position(self, current: int, mask: int, moves: int) -> int:
+        """Returns the exact score of the position with null window searches."""
+        if winning_cells(current, mask) & possible_moves(mask):
+            return (NB_CELLS + 1 - moves) // 2
+        low = -((NB_CELLS - moves) // 2)
+        high = (NB_CELLS + 1 - moves) // 2
+        while low < high:
+            # look for the sign first, then narrow
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and int(high / 2) > middle:
+                middle = int(high / 2)
+            score = self.negamax(current, mask, moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def solve(self, board: Board) -> int:
+        """Returns the exact score of the board for the player to move."""
+        return self.solve_position(*get_position(board))
+
+    def analyze(self, board: Board) -> list:
+        """Returns the score of each column for the player to move, None if full."""
+        current, mask, moves = get_position(board)
+        win = winning_cells(current, mask)
+        scores = []
+        for column in range(NB_COLUMNS):
+            move = possible_moves(mask) & COLUMN_MASKS[column]
+            if not move:
+                scores.append(None)
+            elif move & win:
+                scores.append((NB_CELLS + 1 - moves) // 2)
+            else:
+                opponent = current ^ mask
+                scores.append(-self.solve_position(opponent, mask | move, moves + 1))
+        return scores
+
+    def best_move(self, board: Board) -> int:
+        """Returns the column with the best score, the first one from the center on ties."""
+        scores = self.analyze(board)
+        return max(
+            (c for c in COLUMN_ORDER if scores[c] is not None), key=lambda c: scores[c]
+        )
+
+
+def get_outcome(board: Board, score: int) -> Tuple[Optional[str], int]:
+    """
+    Returns (winner, number of moves until the end) for the score of the board,
+    with a None winner for a draw.
+    """
+    moves = len(board.history)
+    if score == 0:
+        return None, NB_CELLS - moves
+    to_play = Board.RED if moves % 2 == 0 else Board.YELLOW
+    other = Board.YELLOW if to_play == Board.RED else Board.RED
+    winner = to_play if score > 0 else other
+    # number of tokens of the winner when he wins
+    winner_tokens = NB_CELLS // 2 + 1 - abs(score)
+    last_move = 2 * winner_tokens - 1 if winner == Board.RED else 2 * winner_tokens
+    return winner, last_move - moves
+
+
+default_solver = None
+
+
+def solve(board: Board) -> int:
+    """Returns the exact score of the board for the player to move."""
+    global default_solver
+    if default_solver is None:
+        default_solver = Solver()
+    return default_solver.solve(board)
@@ -0,0 +1,312 @@
+# Tournament engine: play the games of many matchups in a pool of processes.
+#
+# python3 tournament.py --players eval_3:board_actions_2:4 eval_4:board_actions_2:4
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import Iterable, List, Tuple
+from board import Board
+from game import Game
+from player import get_player
+from profiling import profiled, clear_profiles, merge_profiles, PROFILE_TOP
+from game_store import GameStore, get_game_seed, seed_game
+from latency import get_latency, trace_move, append_trace
+
+# The players of a worker process, built once by (spec, symbol)
+worker_players = {}
+
+
+# Games -------------------------------------------------------------------------
+
+
+def get_worker_player(spec: str, symbol: str):
+    """
+    Returns the player of this spec for this color in the current process.
+    The players are kept between the games (transposition tables, pools...).
+    """
+    key = (spec, symbol)
+    if key not in worker_players:
+        worker_players[key] = get_player(spec)
+    return worker_players[key]
+
+
+def play_game(
+    red_spec: str,
+    yellow_spec: str,
+    record_path=None,
+    seed: int = None,
+    index: int = 0,
+    trace_path=None,
+) -> dict:
+    """
+    Plays one game and returns its result and the time spent by each player
+    (total and per move).
+    With record_path, the game is appended to this game record file.
+    With seed, the index-th game of the matchup is seeded (see seed_game), so
+    it is the same on each run.
+    With trace_path, the moves are appended to this trace (see latency.py).
+    """
+    player_r = get_worker_player(red_spec, Board.RED)
+    player_y = get_worker_player(yellow_spec, Board.YELLOW)
+    if seed is not None:
+        seed_game(get_game_seed(seed, red_spec, yellow_spec, index), player_r, player_y)
+    game = Game(player_r, player_y, record_path)
+    times = {Board.RED: [], Board.YELLOW: []}
+    trace = []
+    symbol = Board.RED
+    while not game.has_ended():
+        before = perf_counter()
+        game.player_turn()
+        times[symbol].append(perf_counter() - before)
+        if trace_path is not None:
+            board = game.board
+            trace.append(
+                trace_move(len(board.history), symbol, board.get_last_move(), times[symbol][-1])
+            )
+        symbol = Board.YELLOW if symbol == Board.RED else Board.RED
+    if trace_path is not None:
+        append_trace(trace_path, trace, red=red_spec, yellow=yellow_spec, seed=seed, index=index)
+    winner = None
+    if game.is_winner(Board.RED):
+        winner = Board.RED
+    elif game.is_winner(Board.YELLOW):
+        winner = Board.YELLOW
+    return {
+        "red": red_spec,
+        "yellow": yellow_spec,
+        "seed": seed,
+        "index": index,
+        "winner": winner,
+        "nb_moves": len(game.board.history),
+        "time_red": sum(times[Board.RED]),
+        "time_yellow": sum(times[Board.YELLOW]),
+        "move_times_red": times[Board.RED],
+        "move_times_yellow": times[Board.YELLOW],
+    }
+
+
+# Tournament --------------------------------------------------------------------
+
+
+def new_matchup(red_spec: str, yellow_spec: str) -> dict:
+    return {
+        "red": red_spec,
+        "yellow": yellow_spec,
+        "nb_games": 0,
+        "red_wins": 0,
+        "yellow_wins": 0,
+        "draws": 0,
+        "nb_moves": 0,
+        "time_red": 0.0,
+        "time_yellow": 0.0,
+        # the move times of each game, replaced by get_latency at the end
+        "latency_red": [],
+        "latency_yellow": [],
+    }
+
+
+def add_game(matchup: dict, game: dict) -> None:
+    """Adds the result of a game to the totals of its matchup."""
+    matchup["nb_games"] += 1
+    if game["winner"] == Board.RED:
+        matchup["red_wins"] += 1
+    elif game["winner"] == Board.YELLOW:
+        matchup["yellow_wins"] += 1
+    else:
+        matchup["draws"] += 1
+    matchup["nb_moves"] += game["nb_moves"]
+    matchup["time_red"] += game["time_red"]
+    matchup["time_yellow"] += game["time_yellow"]
+    # the games stored before the move times have none
+    matchup["latency_red"].append(game.get("move_times_red", []))
+    matchup["latency_yellow"].append(game.get("move_times_yellow", []))
+
+
+def run_tournament(
+    matchups: Iterable[Tuple[str, str]],
+    nb_games: int,
+    output: str,
+    workers=None,
+    profile=None,
+    profile_top: int = PROFILE_TOP,
+    record_path=None,
+    seed: int = 0,
+    store_path=None,
+    trace_path=None,
+) -> List[dict]:
+    """
+    Plays nb_games games of each (red spec, yellow spec) matchup and writes the
+    results in the JSON file output. The games are the unit of work of the pool,
+    so a slow matchup is spread over all the processes.
+    With profile, the games are profiled in each process and the profiles are
+    merged in this file.
+    With record_path, the moves of the games are appended to this file.
+    The games are seeded from seed (None for unseeded games). With store_path,
+    each finished game is saved in this game store (see game_store.py) and the
+    games already in it are not played again: an interrupted tournament
+    resumes where it stopped.
+    Each matchup has the latency of the moves of both players: percentiles,
+    histogram and percentiles by ply (see latency.get_latency). With
+    trace_path, the moves of the games played are appended to this trace.
+    """
+    if profile is not None:
+        clear_profiles(profile)
+    results = {}
+    for red_spec, yellow_spec in matchups:
+        results[(red_spec, yellow_spec)] = new_matchup(red_spec, yellow_spec)
+    store = GameStore(store_path) if store_path is not None and seed is not None else None
+    games = []
+    for red_spec, yellow_spec in results:
+        for index in range(nb_games):
+            game = store.get(red_spec, yellow_spec, seed, index) if store else None
+            if game is not None:
+                add_game(results[(red_spec, yellow_spec)], game)
+            else:
+                games.append((red_spec, yellow_spec, index))
+    total = len(games)
+    if total < len(results) * nb_games:
+        print(f"{len(results) * nb_games - total} games already in {store_path}")
+    before = perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(
+                profiled,
+                profile,
+                play_game,
+                red_spec,
+                yellow_spec,
+                record_path,
+                seed,
+                index,
+                trace_path,
+            )
+            for red_spec, yellow_spec, index in games
+        ]
+        for i, future in enumerate(as_completed(futures)):
+            game = future.result()
+            add_game(results[(game["red"], game["yellow"])], game)
+            if store is not None:
+                store.add(game)
+            print(f"{i + 1}/{total} | {game['red']} VS {game['yellow']}")
+    results = list(results.values())
+    for matchup in results:
+        matchup["latency_red"] = get_latency(matchup["latency_red"], 1)
+        matchup["latency_yellow"] = get_latency(matchup["latency_yellow"], 2)
+    with open(output, mode="w", encoding="utf-8") as f:
+        json.dump(
+            {"nb_games": nb_games, "duration": perf_counter() - before, "matchups": results},
+            f,
+            indent=2,
+        )
+    if profile is not None:
+        merge_profiles(profile, profile_top)
+    return results
+
+
+# Plots -------------------------------------------------------------------------
+
+
+def plot_stats(ax, title: str, r_nb_win: int, y_nb_win: int, nb_games: int):
+    draw_count = nb_games - (r_nb_win + y_nb_win)
+    y = [r_nb_win, y_nb_win]
+    colors = ["red", "yellow"]
+    if draw_count > 0:
+        y.append(draw_count)
+        colors.append("grey")
+    ax.pie(y, colors=colors)
+    ax.set_title(title, fontsize=7)
+
+
+def plot_tournament(results_path: str, out_dir: str) -> None:
+    """Saves a pie chart for each matchup of a results file."""
+    import matplotlib.pyplot as plt
+
+    with open(results_path, encoding="utf-8") as f:
+        results = json.load(f)
+    os.makedirs(out_dir, exist_ok=True)
+    for matchup in results["matchups"]:
+        fig, ax = plt.subplots()
+        plot_stats(
+            ax,
+            f"{matchup['red']} (red) vs {matchup['yellow']} (yellow)",
+            matchup["red_wins"],
+            matchup["yellow_wins"],
+            matchup["nb_games"],
+        )
+        fig.suptitle("AI Stats for Connect 4")
+        fig.savefig(os.path.join(out_dir, f"{matchup['red']}_{matchup['yellow']}.png"))
+        plt.close(fig)
+
+
+# Script ------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Connect 4 Tournament",
+        description="Play all the matchups between the players (both colors).",
+    )
+    parser.add_argument(
+        "--players", nargs="+", required=True, help="The players to compare."
+    )
+    parser.add_argument(
+        "--nb-games", type=int, default=10, help="The number of games per matchup."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="The number of processes."
+    )
+    parser.add_argument(
+        "--output", type=str, default="tournament.json", help="The results file."
+    )
+    parser.add_argument(
+        "--plot", type=str, default=None, help="The directory of the pie charts."
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="The cProfile file of the games (open it with snakeviz).",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=PROFILE_TOP,
+        help="The number of functions printed by cumulative time.",
+    )
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        help="Append the moves of the games to this game record file.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the games.")
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="The game store (JSON lines): the games in it are not played again.",
+    )
+    parser.add_argument(
+        "--trace", type=str, default=None, help="Append the moves to this JSON lines trace."
+    )
+    args = parser.parse_args()
+
+    matchups = [
+        (red, yellow) for red in args.players for yellow in args.players if red != yellow
+    ]
+    run_tournament(
+        matchups,
+        args.nb_games,
+        args.output,
+        args.workers,
+        args.profile,
+        args.profile_top,
+        args.record,
+        args.seed,
+        args.store,
+        args.trace,
+    )
+    if args.plot is not None:
+        plot_tournament(args.output, args.plot)
@@ -0,0 +1,106 @@
+from typing import Optional, Tuple
+from board import Board
+
+# Bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# An entry is (key, depth, score, bound, best_action)
+Entry = Tuple[int, int, float, int, Optional[int]]
+
+
+def canonical_key(board: Board, symbol: str) -> Tuple[int, bool]:
+    """
+    Returns (key, mirrored): the key of the position for the maximizing symbol,
+    shared by the position and its mirror (see Board.get_canonical_key), and
+    True if the moves stored with this key are mirrored.
+    The scores depend on the point of view, so the symbol is part of the key.
+    """
+    key, mirrored = board.get_canonical_key()
+    return key << 1 | (symbol == Board.RED), mirrored
+
+
+def previous_prime(n: int) -> int:
+    """
+    Returns the largest prime number lower or equal to n, but the Mersenne
+    primes (2^k - 1): a key modulo 2^k - 1 is the sum of its k-bit chunks, so
+    the close positions would collide.
+    """
+    while n > 2 and (n & (n + 1) == 0 or any(n % d == 0 for d in range(2, int(n**0.5) + 1))):
+        n -= 1
+    return n
+
+
+class TranspositionTable:
+    """
+    A bounded cache of search results.
+    Each bucket has two slots: the first one keeps the deepest search
+    (depth-preferred) and the second one is always replaced.
+    """
+
+    def __init__(self, size: int = 1 << 16) -> None:
+        assert size >= 2, "The table needs at least one bucket!"
+        self.size = size
+        # the position keys are very regular, a prime modulo spreads them
+        self.__nb_buckets = previous_prime(size // 2)
+        self.__deep = [None] * self.__nb_buckets
+        self.__recent = [None] * self.__nb_buckets
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def __len__(self) -> int:
+        return sum(e is not None for e in self.__deep) + sum(
+            e is not None for e in self.__recent
+        )
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """Returns the entry stored for this key, or None."""
+        index = key % self.__nb_buckets
+        entry = self.__deep[index]
+        if entry is None or entry[0] != key:
+            entry = self.__recent[index]
+            if entry is None or entry[0] != key:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return entry
+
+    def store(
+        self, key: int, depth: int, score: float, bound: int, best_action: Optional[int]
+    ) -> None:
+        """Stores the result of a search, evicting an older entry if needed."""
+        index = key % self.__nb_buckets
+        entry = (key, depth, score, bound, best_action)
+        deep = self.__deep[index]
+        if deep is None or deep[0] == key:
+            self.__deep[index] = entry
+        elif depth >= deep[1]:
+            # the deepest entry moves down to the always-replace slot
+            self.__store_recent(index, deep)
+            self.__deep[index] = entry
+        else:
+            self.__store_recent(index, entry)
+
+    def __store_recent(self, index: int, entry: Entry) -> None:
+        recent = self.__recent[index]
+        if recent is not None and recent[0] != entry[0]:
+            self.overwrites += 1
+        self.__recent[index] = entry
+
+    def clear(self) -> None:
+        """Removes all the entries, the counters are kept."""
+        self.__deep = [None] * self.__nb_buckets
+        self.__recent = [None] * self.__nb_buckets
+
+    def stats(self) -> dict:
+        """Returns the counters of the table."""
+        return {
+            "size": self.size,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "overwrites": self.overwrites,
+        }